@@ -1,28 +1,135 @@
-import json
-
-# Read the test results
-with open('faq_test_results.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# Find all issues
-issues = [r for r in data if r.get('has_error') or r.get('is_empty') or r.get('has_formatting_issues')]
-
-print(f"Total questions: {len(data)}")
-print(f"Questions with issues: {len(issues)}")
-print(f"  - Errors: {sum(1 for r in data if r.get('has_error'))}")
-print(f"  - Empty: {sum(1 for r in data if r.get('is_empty'))}")
-print(f"  - Formatting issues: {sum(1 for r in data if r.get('has_formatting_issues'))}")
-print("\n" + "="*80)
-print("ISSUES FOUND:")
-print("="*80)
-
-for i, r in enumerate(issues[:20], 1):  # Show first 20
-    print(f"\n{i}. Q: {r['question']}")
-    if r.get('has_error'):
-        print(f"   ERROR: {r.get('error', 'Unknown')}")
-    if r.get('is_empty'):
-        print(f"   ISSUE: Empty or too short")
-    if r.get('has_formatting_issues'):
-        print(f"   FORMATTING ISSUES: {', '.join(r.get('issues', []))}")
-    print(f"   Answer: {r['answer'][:200]}...")
+import os
+import re
+import sys
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    import json
+    ORJSON_AVAILABLE = False
+
+RESULTS_FILE = 'faq_test_results.json'
+MAX_SHOWN = 20
+
+# test_faqs.py writes one record per "\n  {" ... "\n  }" block (json.dump with indent=2);
+# string values cannot contain a raw newline, so these markers only match record boundaries.
+RECORD_START = b'\n  {'
+RECORD_END = b'\n  }'
+FLAG_PATTERN = re.compile(rb'"(has_error|is_empty|has_formatting_issues)": true')
+
+# Issue kinds are packed into one int per record
+FLAG_ERROR = 1
+FLAG_EMPTY = 2
+FLAG_FORMATTING = 4
+FLAG_BITS = {b'has_error': FLAG_ERROR, b'is_empty': FLAG_EMPTY, b'has_formatting_issues': FLAG_FORMATTING}
+
+
+def read_file(path):
+    """Read a whole file with as few read() syscalls as possible."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        remaining = os.fstat(fd).st_size
+        chunks = []
+        while remaining > 0:
+            chunk = os.read(fd, remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+    finally:
+        os.close(fd)
+
+
+def loads(raw):
+    """Decode JSON bytes, using orjson when it is installed."""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw.decode('utf-8'))
+
+
+def scan_flags(raw):
+    """
+    Count flagged records straight from the raw bytes and parse only the ones to display.
+
+    Returns None when the file does not use the indent=2 layout written by test_faqs.py.
+    """
+    if not raw.lstrip().startswith(b'[' + RECORD_START):
+        return None
+
+    n_errors = n_empty = n_formatting = 0
+    issue_starts = []
+    issue_flags = []
+    for match in FLAG_PATTERN.finditer(raw):
+        flag = FLAG_BITS[match.group(1)]
+        n_errors += flag & FLAG_ERROR
+        n_empty += (flag & FLAG_EMPTY) >> 1
+        n_formatting += (flag & FLAG_FORMATTING) >> 2
+        start = raw.rfind(RECORD_START, 0, match.start())
+        if issue_starts and issue_starts[-1] == start:
+            issue_flags[-1] |= flag
+        else:
+            issue_starts.append(start)
+            issue_flags.append(flag)
+
+    issues_head = []
+    for start, flags in zip(issue_starts[:MAX_SHOWN], issue_flags):
+        end = raw.find(RECORD_END, start) + len(RECORD_END)
+        issues_head.append((flags, loads(raw[start:end])))
+
+    return raw.count(RECORD_START), len(issue_starts), n_errors, n_empty, n_formatting, issues_head
+
+
+def scan_records(records):
+    """Classify result records in a single pass."""
+    n_total = n_errors = n_empty = n_formatting = n_issues = 0
+    issues_head = []
+    for r in records:
+        n_total += 1
+        flags = (bool(r.get('has_error'))
+                 | bool(r.get('is_empty')) << 1
+                 | bool(r.get('has_formatting_issues')) << 2)
+        if flags:
+            n_errors += flags & FLAG_ERROR
+            n_empty += (flags & FLAG_EMPTY) >> 1
+            n_formatting += (flags & FLAG_FORMATTING) >> 2
+            n_issues += 1
+            if len(issues_head) < MAX_SHOWN:
+                issues_head.append((flags, r))
+    return n_total, n_issues, n_errors, n_empty, n_formatting, issues_head
+
+
+# Read the test results; only fully parse them if the layout is not recognised
+raw = read_file(RESULTS_FILE)
+
+summary = scan_flags(raw)
+if summary is None:
+    summary = scan_records(loads(raw))
+n_total, n_issues, n_errors, n_empty, n_formatting, issues_head = summary
+
+# Build the whole report and write it in one call
+out = [
+    f"Total questions: {n_total}\n"
+    f"Questions with issues: {n_issues}\n"
+    f"  - Errors: {n_errors}\n"
+    f"  - Empty: {n_empty}\n"
+    f"  - Formatting issues: {n_formatting}\n"
+    f"\n{'=' * 80}\n"
+    f"ISSUES FOUND:\n"
+    f"{'=' * 80}\n"
+]
+
+for i, (flags, r) in enumerate(issues_head, 1):
+    out.append(f"\n{i}. Q: {r['question']}\n")
+    if flags & FLAG_ERROR:
+        out.append(f"   ERROR: {r.get('error', 'Unknown')}\n")
+    if flags & FLAG_EMPTY:
+        out.append("   ISSUE: Empty or too short\n")
+    if flags & FLAG_FORMATTING:
+        out.append(f"   FORMATTING ISSUES: {', '.join(r.get('issues', []))}\n")
+    out.append(f"   Answer: {r['answer'][:200]}...\n")
+
+sys.stdout.write(''.join(out))
@@ -8,15 +8,49 @@ from flask_cors import CORS
 import os
 import json
 import logging
+import functools
+import hashlib
+import heapq
+import importlib.util
+import atexit
+import tempfile
+import threading
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from pathlib import Path
+from urllib.parse import unquote
+import numpy as np
 from datetime import datetime
-from excel_to_rag import ExcelToRAG
-from rag_pipeline import RAGPipeline
-from rag_ingestion import RAGIngestion
-from query_driven_pipeline import QueryDrivenPipeline
-import pandas as pd
 import re
-from difflib import SequenceMatcher
+import stat
+from bisect import bisect_left
+
+# Aho-Corasick matches many keywords in one pass; fall back to a regex alternation
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
+# orjson is much faster than the stdlib json module; fall back to json when it is missing
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# msgpack stores training/edited-answer data without JSON text encoding; fall back to JSON files
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# python-calamine is a much faster Excel reader than openpyxl/xlrd (pandas engine='calamine')
+CALAMINE_AVAILABLE = importlib.util.find_spec('python_calamine') is not None
 
 # Configure logging
 logging.basicConfig(
@@ -25,8 +59,53 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Tracebacks are only returned in error responses in debug mode (FLASK_DEBUG=true)
+EXPOSE_TRACEBACKS = os.getenv('FLASK_DEBUG', 'false').lower() == 'true'
+
+def _debug_traceback():
+    """
+    Log the current exception's traceback at DEBUG level and return it.
+    
+    Formatting walks every frame and reads source lines, so it is skipped (returning None)
+    unless debug logging is on or tracebacks are returned to clients.
+    """
+    if not (EXPOSE_TRACEBACKS or logger.isEnabledFor(logging.DEBUG)):
+        return None
+    error_trace = traceback.format_exc()
+    logger.debug("Traceback: %s", error_trace)
+    return error_trace
+
+def _with_traceback(payload, error_trace):
+    """Add error_trace to an error response payload when tracebacks are exposed."""
+    if EXPOSE_TRACEBACKS and error_trace:
+        payload['traceback'] = error_trace
+    return payload
+
 app = Flask(__name__, static_folder='static', template_folder='templates')
 
+# Seconds browsers may reuse static assets without revalidating (after that they revalidate
+# and get 304 Not Modified). Asset URLs are not versioned, so keep this short enough that a
+# deploy is picked up the same day.
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '3600'))
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = STATIC_MAX_AGE
+
+if ORJSON_AVAILABLE:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Serve jsonify() responses and request.get_json() through orjson."""
+
+        def dumps(self, obj, **kwargs):
+            option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+
 # CORS Configuration - Security: Restrict origins in production
 # Set ALLOWED_ORIGINS environment variable (comma-separated) to restrict access
 # Default: "*" for development, should be restricted in production
@@ -37,7 +116,7 @@ if allowed_origins == ['*']:
         r"/api/*": {
             "origins": "*",
             "methods": ["GET", "POST", "DELETE", "PUT", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "X-Filename", "X-Upload-Id", "Content-Range"]
         }
     })
 else:
@@ -46,7 +125,7 @@ else:
         r"/api/*": {
             "origins": allowed_origins,
             "methods": ["GET", "POST", "DELETE", "PUT", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "X-Filename", "X-Upload-Id", "Content-Range"]
         }
     })
 
@@ -61,6 +140,11 @@ rag_ingestion = None  # Ingestion module
 query_pipeline = None  # Query-driven analytics pipeline
 
 loaded_files = set()
+# Most loaded file paths listed by /api/database-stats (loaded_files_count is always the total)
+MAX_STATS_LOADED_FILES = 200
+
+# Paths already resolved by _get_valid_path: {(path_key, default_subdir): path}
+_resolved_paths = {}
 
 def _get_valid_path(path_key: str, default_subdir: str) -> str:
     """
@@ -73,27 +157,39 @@ def _get_valid_path(path_key: str, default_subdir: str) -> str:
     Returns:
         Valid path string
     """
+    cache_key = (path_key, default_subdir)
+    if cache_key in _resolved_paths:
+        return _resolved_paths[cache_key]
+    
     # Try environment variable first
     env_path = os.getenv(path_key)
-    if env_path and os.path.exists(os.path.dirname(env_path) if os.path.dirname(env_path) else env_path):
-        return env_path
+    if env_path:
+        try:
+            os.stat(os.path.dirname(env_path) or env_path)
+            _resolved_paths[cache_key] = env_path
+            return env_path
+        except OSError:
+            pass
     
-    # Try home directory
+    # Try home directory (mkdir fails if the home directory itself is missing)
     try:
         home_dir = os.path.expanduser("~")
-        if home_dir and os.path.exists(home_dir):
-            default_path = os.path.join(home_dir, default_subdir)
-            # Create directory if it doesn't exist
-            os.makedirs(default_path, exist_ok=True)
-            return default_path
+        if home_dir:
+            default_path = Path(home_dir, default_subdir)
+            default_path.mkdir(exist_ok=True)
+            _resolved_paths[cache_key] = str(default_path)
+            return str(default_path)
+    except FileNotFoundError:
+        pass
     except Exception as e:
         logger.warning(f"Could not create path in home directory: {e}")
     
     # Fallback to current directory
-    fallback_path = os.path.join(os.getcwd(), default_subdir)
-    os.makedirs(fallback_path, exist_ok=True)
+    fallback_path = Path(os.getcwd(), default_subdir)
+    fallback_path.mkdir(parents=True, exist_ok=True)
     logger.info(f"Using fallback path for {path_key}: {fallback_path}")
-    return fallback_path
+    _resolved_paths[cache_key] = str(fallback_path)
+    return str(fallback_path)
 
 settings = {
     'download_path': _get_valid_path('DOWNLOAD_PATH', 'Downloads'),
@@ -103,6 +199,16 @@ settings = {
 # Maximum file size: 100MB (100 * 1024 * 1024 bytes)
 # Can be overridden with MAX_FILE_SIZE environment variable
 MAX_FILE_SIZE = int(os.getenv('MAX_FILE_SIZE', '104857600'))  # 100MB default
+# File types accepted by the upload endpoints
+UPLOAD_EXTENSIONS = ('.xlsx', '.xls', '.xlsm', '.xlsb', '.csv')
+# Read size for streamed uploads
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Characters not allowed in download filenames, mapped to '_'
+FILENAME_SANITIZE_TABLE = str.maketrans({c: '_' for c in '<>:"/\\|?*'})
+# Longest custom download filename accepted (before the .txt extension)
+MAX_DOWNLOAD_FILENAME_LENGTH = 200
+# Rows read from a file uploaded as a training answer (larger answers are not usable as context)
+MAX_TRAINING_ROWS = 5000
 # Training data storage: {question: answer}
 training_data = {}
 TRAINING_DATA_FILE = "training_data.json"
@@ -110,80 +216,253 @@ TRAINING_DATA_FILE = "training_data.json"
 edited_answers = {}
 EDITED_ANSWERS_FILE = "edited_answers.json"
 
+def _msgpack_store_path(json_path):
+    """The .msgpack sibling of a training/edited-answer JSON file."""
+    return os.path.splitext(json_path)[0] + '.msgpack'
+
+def _data_store_path(json_path):
+    """Path training/edited-answer data is persisted at (a .msgpack sibling when msgpack is installed)."""
+    if MSGPACK_AVAILABLE:
+        return _msgpack_store_path(json_path)
+    return json_path
+
+def _data_store_read_path(json_path):
+    """
+    Path to load training/edited-answer data from, logging the choice when both files exist.
+    
+    With msgpack installed the .msgpack file wins; the JSON file is only read until the first
+    msgpack save has migrated it (see _retire_json_store).
+    """
+    msgpack_path = _msgpack_store_path(json_path)
+    if MSGPACK_AVAILABLE:
+        if not os.path.exists(msgpack_path):
+            # One-time migration: the JSON file is rewritten as msgpack on the next save
+            return json_path
+        if os.path.exists(json_path):
+            logger.warning(f"Both {msgpack_path} and {json_path} exist; loading {msgpack_path}")
+        return msgpack_path
+    if os.path.exists(msgpack_path):
+        logger.warning(f"msgpack is not installed; loading {json_path} and ignoring {msgpack_path}")
+    return json_path
+
+def _retire_json_store(json_path, saved_path):
+    """Once data has been saved as msgpack, rename the JSON file it replaces to *.json.migrated."""
+    if saved_path == json_path or not os.path.exists(json_path):
+        return
+    try:
+        os.replace(json_path, json_path + '.migrated')
+        logger.info(f"Migrated {json_path} to {saved_path}; the old file is now {json_path}.migrated")
+    except OSError as e:
+        logger.warning(f"Could not rename migrated {json_path}: {e}")
+
+# Buffer size for JSON file I/O (the stdlib json encoder issues many small writes)
+JSON_IO_BUFFER_SIZE = 64 * 1024
+# Parsed JSON files keyed by path: {path: ((st_mtime_ns, st_size), data)}
+_json_file_cache = {}
+
+def _read_json_file(path):
+    """Read and parse a JSON file (or a .msgpack data file)."""
+    if path.endswith('.msgpack'):
+        with open(path, 'rb', buffering=JSON_IO_BUFFER_SIZE) as f:
+            return msgpack.unpackb(f.read(), raw=False, strict_map_key=False)
+    if ORJSON_AVAILABLE:
+        with open(path, 'rb', buffering=JSON_IO_BUFFER_SIZE) as f:
+            return orjson.loads(f.read())
+    with open(path, 'r', encoding='utf-8', buffering=JSON_IO_BUFFER_SIZE) as f:
+        return json.load(f)
+
+def _read_json_cached(path):
+    """
+    Read a JSON file, reusing the last parse while its mtime and size are unchanged.
+    
+    Returns None if the file does not exist. The returned object is shared with the
+    cache, so callers that mutate it must take a copy.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        _json_file_cache.pop(path, None)
+        return None
+    key = (st.st_mtime_ns, st.st_size)
+    cached = _json_file_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    data = _read_json_file(path)
+    _json_file_cache[path] = (key, data)
+    return data
+
+def _write_json_file(path, data, pretty=False):
+    """
+    Serialize data to a UTF-8 JSON file (or a .msgpack data file), replacing it atomically.
+    
+    Output is compact unless pretty is set (for files people edit by hand).
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix='.tmp'
+    )
+    try:
+        if path.endswith('.msgpack'):
+            with os.fdopen(fd, 'wb', buffering=JSON_IO_BUFFER_SIZE) as f:
+                f.write(msgpack.packb(data, use_bin_type=True))
+        elif ORJSON_AVAILABLE:
+            with os.fdopen(fd, 'wb', buffering=JSON_IO_BUFFER_SIZE) as f:
+                option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+                f.write(orjson.dumps(data, option=option))
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8', buffering=JSON_IO_BUFFER_SIZE) as f:
+                if pretty:
+                    json.dump(data, f, indent=2, ensure_ascii=False)
+                else:
+                    json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
 # Load settings from app_settings.json if it exists
 def load_settings_from_file():
     """Load settings from app_settings.json file."""
     global settings
     settings_file = "app_settings.json"
-    if os.path.exists(settings_file):
-        try:
-            with open(settings_file, 'r', encoding='utf-8') as f:
-                file_settings = json.load(f)
-                # Update settings with values from file, but keep defaults if keys are missing
-                if 'download_path' in file_settings:
-                    settings['download_path'] = file_settings['download_path']
-                if 'files_folder_path' in file_settings:
-                    settings['files_folder_path'] = file_settings['files_folder_path']
-                logger.info(f"Loaded settings from {settings_file}")
-                logger.info(f"Files folder path: {settings['files_folder_path']}")
-                logger.info(f"Download path: {settings['download_path']}")
-        except Exception as e:
-            logger.warning(f"Error loading settings from {settings_file}: {e}")
+    try:
+        file_settings = _read_json_cached(settings_file)
+        if file_settings is not None:
+            # Update settings with values from file, but keep defaults if keys are missing
+            if 'download_path' in file_settings:
+                settings['download_path'] = file_settings['download_path']
+            if 'files_folder_path' in file_settings:
+                settings['files_folder_path'] = file_settings['files_folder_path']
+            logger.info(f"Loaded settings from {settings_file}")
+            logger.info(f"Files folder path: {settings['files_folder_path']}")
+            logger.info(f"Download path: {settings['download_path']}")
+    except Exception as e:
+        logger.warning(f"Error loading settings from {settings_file}: {e}")
+
+# Save settings to app_settings.json
+def save_settings_to_file():
+    """Save settings to app_settings.json file."""
+    settings_file = "app_settings.json"
+    try:
+        _write_json_file(settings_file, dict(settings), pretty=True)
+        logger.info(f"Saved settings to {settings_file}")
+        return True
+    except Exception as e:
+        logger.warning(f"Error saving settings to file: {e}")
+        return False
 
 # Load training data from file
 def load_training_data():
-    """Load training data from training_data.json file."""
+    """Load training data from training_data.msgpack (or training_data.json)."""
     global training_data
-    if os.path.exists(TRAINING_DATA_FILE):
-        try:
-            with open(TRAINING_DATA_FILE, 'r', encoding='utf-8') as f:
-                training_data = json.load(f)
-                logger.info(f"Loaded {len(training_data)} training entries from {TRAINING_DATA_FILE}")
-        except Exception as e:
-            logger.warning(f"Error loading training data from {TRAINING_DATA_FILE}: {e}")
-            training_data = {}
+    path = _data_store_read_path(TRAINING_DATA_FILE)
+    try:
+        file_data = _read_json_cached(path)
+        if file_data is not None:
+            training_data = dict(file_data)
+            logger.info(f"Loaded {len(training_data)} training entries from {path}")
+    except Exception as e:
+        logger.warning(f"Error loading training data from {path}: {e}")
+        training_data = {}
 
 # Save training data to file
 def save_training_data():
-    """Save training data to training_data.json file."""
+    """Save training data to training_data.msgpack (or training_data.json)."""
+    path = _data_store_path(TRAINING_DATA_FILE)
     try:
-        with open(TRAINING_DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(training_data, f, indent=2, ensure_ascii=False)
-        logger.info(f"Saved {len(training_data)} training entries to {TRAINING_DATA_FILE}")
+        _write_json_file(path, dict(training_data))
+        logger.info(f"Saved {len(training_data)} training entries to {path}")
+        _retire_json_store(TRAINING_DATA_FILE, path)
         return True
     except Exception as e:
-        logger.warning(f"Error saving training data to {TRAINING_DATA_FILE}: {e}")
+        logger.warning(f"Error saving training data to {path}: {e}")
         return False
 
 # Load edited answers from file
 def load_edited_answers():
-    """Load edited answers from edited_answers.json file."""
+    """Load edited answers from edited_answers.msgpack (or edited_answers.json)."""
     global edited_answers
-    if os.path.exists(EDITED_ANSWERS_FILE):
-        try:
-            with open(EDITED_ANSWERS_FILE, 'r', encoding='utf-8') as f:
-                edited_answers = json.load(f)
-                logger.info(f"Loaded {len(edited_answers)} edited answers from {EDITED_ANSWERS_FILE}")
-        except Exception as e:
-            logger.warning(f"Error loading edited answers from {EDITED_ANSWERS_FILE}: {e}")
-            edited_answers = {}
+    path = _data_store_read_path(EDITED_ANSWERS_FILE)
+    try:
+        file_data = _read_json_cached(path)
+        if file_data is not None:
+            edited_answers = dict(file_data)
+            logger.info(f"Loaded {len(edited_answers)} edited answers from {path}")
+    except Exception as e:
+        logger.warning(f"Error loading edited answers from {path}: {e}")
+        edited_answers = {}
 
 # Save edited answers to file
 def save_edited_answers():
-    """Save edited answers to edited_answers.json file."""
+    """Save edited answers to edited_answers.msgpack (or edited_answers.json)."""
+    path = _data_store_path(EDITED_ANSWERS_FILE)
     try:
-        with open(EDITED_ANSWERS_FILE, 'w', encoding='utf-8') as f:
-            json.dump(edited_answers, f, indent=2, ensure_ascii=False)
-        logger.info(f"Saved {len(edited_answers)} edited answers to {EDITED_ANSWERS_FILE}")
+        _write_json_file(path, dict(edited_answers))
+        logger.info(f"Saved {len(edited_answers)} edited answers to {path}")
+        _retire_json_store(EDITED_ANSWERS_FILE, path)
         return True
     except Exception as e:
-        logger.warning(f"Error saving edited answers to {EDITED_ANSWERS_FILE}: {e}")
+        logger.warning(f"Error saving edited answers to {path}: {e}")
         return False
 
+# Coalesce bursts of training/edited-answer changes into a single file write
+SAVE_DELAY_SECONDS = 1.5
+_save_lock = threading.Lock()
+_pending_saves = {}  # {name: (threading.Timer, save_func)}
+
+def _schedule_save(name, save_func):
+    """(Re)start the delayed save for name so only the last change in a burst is written."""
+    with _save_lock:
+        pending = _pending_saves.get(name)
+        if pending:
+            pending[0].cancel()
+        timer = threading.Timer(SAVE_DELAY_SECONDS, _run_pending_save, args=(name,))
+        timer.daemon = True
+        _pending_saves[name] = (timer, save_func)
+        timer.start()
+
+def _run_pending_save(name):
+    """Run the pending save for name, if it is still pending."""
+    with _save_lock:
+        pending = _pending_saves.pop(name, None)
+    if pending:
+        pending[1]()
+
+def flush_pending_saves():
+    """Write all pending changes now (also runs at interpreter exit)."""
+    with _save_lock:
+        pending = list(_pending_saves.values())
+        _pending_saves.clear()
+    for timer, save_func in pending:
+        timer.cancel()
+        save_func()
+
+atexit.register(flush_pending_saves)
+
+# Incremented on every change to training_data, so views derived from it know when to rebuild
+_training_data_version = 0
+# User-added training entries (training_data minus FAQ questions): (version, {question: answer})
+_user_training_data_cache = None
+
+def mark_training_dirty():
+    """Record a change to training_data and schedule it to be written to disk."""
+    global _training_data_version
+    _training_data_version += 1
+    _schedule_save('training', save_training_data)
+
+def mark_edited_dirty():
+    """Schedule edited_answers to be written to disk."""
+    _schedule_save('edited', save_edited_answers)
+
 # Load settings, training data, and edited answers on startup
-load_settings_from_file()
-load_training_data()
-load_edited_answers()
+# (independent files, each loader only touches its own global, so read them concurrently)
+with ThreadPoolExecutor(max_workers=3) as executor:
+    for future in [executor.submit(loader) for loader in (load_settings_from_file, load_training_data, load_edited_answers)]:
+        future.result()
 
 # Load FAQs
 # IMPORTANT: FAQs are static intent shortcuts, NOT stored answers.
@@ -325,6 +604,10 @@ def load_faqs():
     }
 
 FAQS = load_faqs()
+# Every FAQ question (used to tell FAQ training entries from user-added ones)
+FAQ_QUESTIONS = frozenset().union(
+    *(FAQS[level] for level in ('basic', 'intermediate', 'advanced', 'operational') if level in FAQS)
+)
 
 # Out-of-scope keywords - expanded list
 OUT_OF_SCOPE_KEYWORDS = [
@@ -337,59 +620,328 @@ OUT_OF_SCOPE_KEYWORDS = [
     'personal information', 'my personal', 'my details', 'my info'
 ]
 
-# Cache for file columns to avoid repeated queries
-_file_columns_cache = None
-_file_columns_cache_time = None
+# Common general knowledge subjects for "what is ..." questions
+GENERAL_KNOWLEDGE_INDICATORS = [
+    'chennai', 'mumbai', 'delhi', 'bangalore', 'hyderabad', 'kolkata', 'pune',
+    'city', 'cities', 'country', 'countries', 'state', 'states',
+    'capital', 'population', 'language', 'currency', 'president', 'prime minister',
+    'ocean', 'mountain', 'river', 'planet', 'star', 'atom', 'molecule', 'element',
+    'definition', 'meaning', 'explain', 'describe', 'tell me about',
+    'india', 'usa', 'uk', 'china', 'japan', 'germany', 'france'
+]
 
-def get_file_columns():
-    """Get column names from the processed files (cached for performance)."""
-    global _file_columns_cache, _file_columns_cache_time
+# Common names (personal questions)
+COMMON_NAMES = ['vishal', 'john', 'mike', 'sarah', 'david', 'emily', 'alex', 'chris', 'raj', 'priya']
+
+def _build_keyword_matcher(keywords):
+    """Build a function that tells whether any of the keywords occurs in a string."""
+    if AHOCORASICK_AVAILABLE:
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda text: next(automaton.iter(text), None) is not None
+    pattern = re.compile('|'.join(map(re.escape, keywords)))
+    return lambda text: pattern.search(text) is not None
+
+_has_out_of_scope_keyword = _build_keyword_matcher(OUT_OF_SCOPE_KEYWORDS)
+_has_general_knowledge_indicator = _build_keyword_matcher(GENERAL_KNOWLEDGE_INDICATORS)
+_has_common_name = _build_keyword_matcher(COMMON_NAMES)
+
+# Auto-complete keywords and their related terms (expanded list)
+KEY_TERMS_MAP = {
+    'cost': ['cost', 'price', 'money', 'rupee', 'transportation cost', 'mrp', 'value'],
+    'weight': ['weight', 'kg', 'kilogram', 'ton', 'tonne', 'weight per case'],
+    'volume': ['volume', 'cubic', 'fill', 'volume fill', 'utilization'],
+    'consignment': ['consignment', 'order', 'orders', 'shipment', 'shipments'],
+    'transportation': ['transportation', 'mode', 'modes', 'vehicle', 'truck', 'transport'],
+    'product': ['product', 'products', 'item', 'items', 'sku'],
+    'customer': ['customer', 'customers', 'client', 'clients'],
+    'source': ['source', 'sources', 'origin', 'origins', 'source location', 'source locations'],
+    'destination': ['destination', 'destinations', 'delivery', 'destination location', 'destination locations'],
+    'case': ['case', 'cases', 'no of cases', 'total cases'],
+    'location': ['location', 'locations', 'source location', 'destination location']
+}
+
+def _build_keyword_finder(keyword_map):
+    """Build a function that returns the keywords any of whose related terms occur in a string."""
+    if AHOCORASICK_AVAILABLE:
+        automaton = ahocorasick.Automaton()
+        for keyword, related_terms in keyword_map.items():
+            for term in related_terms:
+                if term in automaton:
+                    automaton.add_word(term, automaton.get(term) + (keyword,))
+                else:
+                    automaton.add_word(term, (keyword,))
+        automaton.make_automaton()
+        return lambda text: frozenset(
+            keyword for _, keywords in automaton.iter(text) for keyword in keywords
+        )
+    # Reverse map: term -> keywords of every term it starts with. Terms matching at the
+    # same position are prefixes of each other, so the longest one found there (the regex
+    # tries longer terms first) accounts for all of them.
+    term_keywords = {}
+    for keyword, related_terms in keyword_map.items():
+        for term in related_terms:
+            term_keywords.setdefault(term, set()).add(keyword)
+    terms = sorted(term_keywords, key=len, reverse=True)
+    prefix_keywords = {
+        term: frozenset(keyword for other in terms if term.startswith(other) for keyword in term_keywords[other])
+        for term in terms
+    }
+    pattern = re.compile('(?=(' + '|'.join(map(re.escape, terms)) + '))')
+    return lambda text: frozenset(
+        keyword for match in pattern.finditer(text) for keyword in prefix_keywords[match.group(1)]
+    )
+
+_find_keywords = _build_keyword_finder(KEY_TERMS_MAP)
+
+# Key terms used to score suggested questions (a term listed twice counts twice)
+KEY_TERMS = [
+    'cost', 'price', 'money', 'rupee', 'transportation cost',
+    'weight', 'kg', 'kilogram', 'ton', 'tonne',
+    'volume', 'cubic', 'fill',
+    'consignment', 'consignments', 'order', 'orders',
+    'transportation', 'mode', 'vehicle', 'truck',
+    'destination', 'source', 'location', 'locations',
+    'product', 'products', 'customer', 'customers',
+    'utilization', 'percentage', 'fill',
+    'cases', 'case', 'mrp', 'value',
+    'dispatch', 'arrival', 'date', 'dates',
+    'missing', 'null', 'empty', 'data type', 'types'
+]
+
+# Key terms whose related terms also count as a (weaker) match
+RELATED_TERMS = {
+    'weight': ['weight', 'kg', 'kilogram', 'ton'],
+    'cost': ['cost', 'price', 'rupee', 'transportation'],
+    'volume': ['volume', 'cubic', 'fill'],
+    'product': ['product', 'items'],
+    'customer': ['customer', 'clients'],
+    'consignment': ['consignment', 'order', 'shipment'],
+    'source': ['source', 'origin'],
+    'destination': ['destination', 'delivery'],
+    'mode': ['mode', 'transportation', 'vehicle', 'truck']
+}
+
+# Precomputed FAQ lookups (FAQs are static, so these never need rebuilding)
+_FAQ_LC = [faq.lower() for faq in FAQS['all']]
+_KEYTERM_HITS = {
+    term: [i for i, faq_lower in enumerate(_FAQ_LC) if term in faq_lower]
+    for term in KEY_TERMS
+}
+
+def _faqs_containing(terms, limit):
+    """The first `limit` FAQs (in FAQ order) containing any of the given key terms."""
+    if len(terms) == 1:
+        hits = _KEYTERM_HITS[terms[0]]
+    else:
+        hits = sorted(set().union(*(_KEYTERM_HITS[term] for term in terms)))
+    return [FAQS['all'][i] for i in hits[:limit]]
+
+def _build_faq_score_matrices():
+    """
+    Encode the FAQs as presence matrices so suggestion scoring is a matrix-vector product.
     
-    if not rag_system or len(loaded_files) == 0:
-        _file_columns_cache = []
+    Returns (word_columns, word_matrix, term_columns, term_matrix):
+    - word_matrix[i, word_columns[w]] is 1 if FAQ i contains the word w (longer than 3 chars)
+    - term_matrix[i, term_columns[t]] is 1 if FAQ i contains key term t, and
+      term_matrix[i, len(term_columns) + term_columns[t]] is 1 if it contains a related term of t
+    """
+    faq_words = [set(w for w in faq_lower.split() if len(w) > 3) for faq_lower in _FAQ_LC]
+    word_columns = {word: col for col, word in enumerate(sorted(set().union(*faq_words)))}
+    word_matrix = np.zeros((len(_FAQ_LC), len(word_columns)), dtype=np.int16)
+    for i, words in enumerate(faq_words):
+        word_matrix[i, [word_columns[w] for w in words]] = 1
+    
+    term_columns = {term: col for col, term in enumerate(dict.fromkeys(KEY_TERMS))}
+    term_matrix = np.zeros((len(_FAQ_LC), 2 * len(term_columns)), dtype=np.int16)
+    for i, faq_lower in enumerate(_FAQ_LC):
+        for term, col in term_columns.items():
+            if term in faq_lower:
+                term_matrix[i, col] = 1
+            if term in RELATED_TERMS and any(related in faq_lower for related in RELATED_TERMS[term]):
+                term_matrix[i, len(term_columns) + col] = 1
+    return word_columns, word_matrix, term_columns, term_matrix
+
+_FAQ_WORD_COLUMNS, _FAQ_WORD_MATRIX, _FAQ_TERM_COLUMNS, _FAQ_TERM_MATRIX = _build_faq_score_matrices()
+# Per-FAQ auto-complete signature: (faq, lowercase text, word set, keyword groups)
+_FAQ_INDEX = [
+    (faq, faq_lower, frozenset(faq_lower.split()), _find_keywords(faq_lower))
+    for faq, faq_lower in zip(FAQS['all'], _FAQ_LC)
+]
+# Sorted (faq_lower, index) pairs: FAQs sharing a prefix are contiguous, found by binary search
+_FAQ_PREFIX_INDEX = sorted((faq_lower, i) for i, faq_lower in enumerate(_FAQ_LC))
+_FAQ_PREFIX_KEYS = [faq_lower for faq_lower, _ in _FAQ_PREFIX_INDEX]
+
+def _faq_prefix_matches(prefix):
+    """Get the indices (in FAQ order) of FAQs whose lowercase text starts with prefix."""
+    matches = []
+    for position in range(bisect_left(_FAQ_PREFIX_KEYS, prefix), len(_FAQ_PREFIX_KEYS)):
+        if not _FAQ_PREFIX_KEYS[position].startswith(prefix):
+            break
+        matches.append(_FAQ_PREFIX_INDEX[position][1])
+    return sorted(matches)
+
+# Column names of files ingested through /api/upload: {file_id: [column, ...]}
+# Files loaded through /api/files/process are tracked by the query pipeline's schema registry.
+_uploaded_file_columns = {}
+
+# Pipeline results for repeated questions (FAQ clicks, retries): {query_text: result}.
+# Answers are computed from the loaded data, so the cache is cleared whenever it changes.
+MAX_QUERY_CACHE_ENTRIES = 1024
+_query_result_cache = OrderedDict()
+_query_result_cache_lock = threading.Lock()
+
+# Successful answers are also kept on disk so they survive restarts, keyed by the query and
+# a fingerprint of the loaded data. Bump ANSWER_CACHE_VERSION when pipeline output changes.
+ANSWER_CACHE_DB = "answer_cache.db"
+ANSWER_CACHE_VERSION = 1
+MAX_ANSWER_CACHE_ROWS = 10000
+_answer_cache_db = None
+_answer_cache_lock = threading.Lock()
+
+def _get_answer_cache_db():
+    """Open (creating if needed) the on-disk answer cache. Must be called with _answer_cache_lock held."""
+    global _answer_cache_db
+    if _answer_cache_db is None:
+        import sqlite3
+        db = sqlite3.connect(ANSWER_CACHE_DB, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            "fingerprint TEXT NOT NULL, query TEXT NOT NULL, result TEXT NOT NULL, "
+            "PRIMARY KEY (fingerprint, query))"
+        )
+        db.commit()
+        _answer_cache_db = db
+    return _answer_cache_db
+
+def _dataset_fingerprint():
+    """Identify the loaded data: the loaded files/sheets, their shape and the file versions on disk."""
+    parts = []
+    for file_id, schema in sorted(query_pipeline.data_loader.schemas.items()):
+        try:
+            st = os.stat(schema['file_path'])
+            version = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            version = None
+        parts.append((file_id, schema['file_path'], schema['sheet_name'],
+                      schema['row_count'], [str(col) for col in schema['column_names']], version))
+    return hashlib.sha1(repr((ANSWER_CACHE_VERSION, parts)).encode('utf-8')).hexdigest()
+
+def _load_cached_answer(fingerprint, query_text):
+    """Look up a stored answer, returning None on a miss or if the cache is unavailable."""
+    try:
+        with _answer_cache_lock:
+            row = _get_answer_cache_db().execute(
+                "SELECT result FROM answers WHERE fingerprint = ? AND query = ?",
+                (fingerprint, query_text)
+            ).fetchone()
+        return app.json.loads(row[0]) if row else None
+    except Exception as e:
+        logger.warning(f"Error reading answer cache: {e}")
+        return None
+
+def _cached_answer_fields(result):
+    """Keep only the parts of a pipeline result that /api/query uses."""
+    query_result = result.get('query_result', {})
+    stored = {
+        'answer': result.get('answer', ''),
+        'success': result.get('success', False),
+        'intent': result.get('intent', ''),
+        'query_result': {'result_type': query_result.get('result_type')}
+    }
+    if query_result.get('result_type') == 'aggregation':
+        stored['query_result']['value'] = query_result.get('value')
+    return stored
+
+def _store_cached_answer(fingerprint, query_text, stored):
+    """Store a trimmed answer from _cached_answer_fields(), keeping the newest rows."""
+    try:
+        with _answer_cache_lock:
+            db = _get_answer_cache_db()
+            db.execute(
+                "INSERT OR REPLACE INTO answers (fingerprint, query, result) VALUES (?, ?, ?)",
+                (fingerprint, query_text, app.json.dumps(stored))
+            )
+            db.execute(
+                "DELETE FROM answers WHERE rowid <= (SELECT MAX(rowid) FROM answers) - ?",
+                (MAX_ANSWER_CACHE_ROWS,)
+            )
+            db.commit()
+    except Exception as e:
+        logger.warning(f"Error writing answer cache: {e}")
+
+def _process_query_cached(query_text):
+    """Run a query through the query-driven pipeline, reusing the result for a repeated query."""
+    with _query_result_cache_lock:
+        result = _query_result_cache.get(query_text)
+        if result is not None:
+            _query_result_cache.move_to_end(query_text)
+            return result
+    
+    # Read before running the query: if files are loaded or cleared meanwhile, the
+    # result may describe the old data and must not outlive the cache clear.
+    data_version = _data_version
+    fingerprint = _dataset_fingerprint()
+    result = _load_cached_answer(fingerprint, query_text)
+    if result is None:
+        result = query_pipeline.process_query(query_text)
+        if not result.get('success'):
+            # Only cache answers; errors may be transient
+            return result
+        result = _cached_answer_fields(result)
+        # Skip the disk cache if the data changed while the query ran,
+        # since the fingerprint would not describe it
+        if _dataset_fingerprint() == fingerprint:
+            _store_cached_answer(fingerprint, query_text, result)
+    
+    if result.get('success'):
+        with _query_result_cache_lock:
+            if _data_version != data_version:
+                return result
+            _query_result_cache[query_text] = result
+            while len(_query_result_cache) > MAX_QUERY_CACHE_ENTRIES:
+                _query_result_cache.popitem(last=False)
+    return result
+
+# Bumped whenever files are loaded or cleared; versions the /api/database-stats ETag.
+# The per-process token keeps ETags from a previous server run from matching.
+_data_version = 0
+_DATA_VERSION_TOKEN = os.urandom(4).hex()
+
+def _file_columns_changed():
+    """Drop results derived from the loaded files after files are loaded or cleared."""
+    global _data_version
+    _data_version += 1
+    _is_out_of_scope.cache_clear()
+    with _query_result_cache_lock:
+        _query_result_cache.clear()
+
+def get_file_columns():
+    """Get column names from the processed files."""
+    if len(loaded_files) == 0:
         return []
     
-    # Return cached result if available (cache for 60 seconds)
-    import time
-    current_time = time.time()
-    if _file_columns_cache is not None and _file_columns_cache_time is not None:
-        if current_time - _file_columns_cache_time < 60:
-            return _file_columns_cache
-    
     try:
-        # Query for column information
-        results = rag_system.query("column names", n_results=3)
-        columns = []
-        
-        # Try to extract column names from results
-        for result in results:
-            content = result.get('content', '')
-            # Look for common patterns in column information
-            if 'column' in content.lower() or 'header' in content.lower():
-                # Try to extract column names from the content
-                lines = content.split('\n')
-                for line in lines:
-                    if '|' in line:
-                        parts = [p.strip() for p in line.split('|')]
-                        columns.extend([p for p in parts if p and len(p) > 1 and p.lower() not in ['column name', 'header', '---', '']])
-        
-        # If we found columns, cache them
+        columns = set()
+        if query_pipeline:
+            columns.update(str(col) for col in query_pipeline.get_column_names())
+        for file_columns in _uploaded_file_columns.values():
+            columns.update(file_columns)
         if columns:
-            _file_columns_cache = list(set(columns))
-            _file_columns_cache_time = current_time
-            return _file_columns_cache
+            return list(columns)
         
         # Fallback: return common logistics columns if data exists
         # This is a safe assumption for logistics files
-        common_columns = [
+        return [
             'consignment', 'consignment number', 'order', 'product', 
             'source', 'destination', 'transportation', 'cost', 'weight',
             'volume', 'customer', 'load type', 'mode', 'mrp', 'cases',
             'transportation cost', 'mrp value', 'weight fill', 'volume fill'
         ]
-        _file_columns_cache = common_columns
-        _file_columns_cache_time = current_time
-        return _file_columns_cache
         
     except Exception as e:
         print(f"Error getting file columns: {e}")
@@ -397,10 +949,18 @@ def get_file_columns():
 
 def is_out_of_scope(query):
     """Check if query is out of scope with better detection."""
-    query_lower = query.lower().strip()
+    return _is_out_of_scope(query.lower().strip())
+
+@functools.lru_cache(maxsize=1024)
+def _is_out_of_scope(query_lower):
+    """
+    Out-of-scope check for a normalized (lowercased, stripped) query.
     
+    Cached per query; the result depends on the loaded file columns, so
+    _file_columns_changed() clears the cache.
+    """
     # Check for exact keyword matches (personal questions)
-    if any(keyword in query_lower for keyword in OUT_OF_SCOPE_KEYWORDS):
+    if _has_out_of_scope_keyword(query_lower):
         return True
     
     # Get file columns to check against
@@ -443,22 +1003,11 @@ def is_out_of_scope(query):
             
             if not is_logistics_term:
                 # If not a file column or logistics term, likely general knowledge
-                # Common general knowledge subjects
-                general_knowledge_indicators = [
-                    'chennai', 'mumbai', 'delhi', 'bangalore', 'hyderabad', 'kolkata', 'pune',
-                    'city', 'cities', 'country', 'countries', 'state', 'states',
-                    'capital', 'population', 'language', 'currency', 'president', 'prime minister',
-                    'ocean', 'mountain', 'river', 'planet', 'star', 'atom', 'molecule', 'element',
-                    'definition', 'meaning', 'explain', 'describe', 'tell me about',
-                    'india', 'usa', 'uk', 'china', 'japan', 'germany', 'france'
-                ]
-                
-                if any(indicator in subject_lower for indicator in general_knowledge_indicators):
+                if _has_general_knowledge_indicator(subject_lower):
                     return True
                 
                 # Check for common names (personal questions)
-                common_names = ['vishal', 'john', 'mike', 'sarah', 'david', 'emily', 'alex', 'chris', 'raj', 'priya']
-                if any(name in subject_lower for name in common_names):
+                if _has_common_name(subject_lower):
                     return True
                 
                 # If it's a single word and not a logistics term, likely asking for definition
@@ -509,99 +1058,82 @@ def get_suggested_questions(query, max_suggestions=5):
     MiniLM is used only for semantic similarity scoring, not for generating suggestions.
     """
     query_lower = query.lower()
+    # Empty/one-character queries (page load, focus events) cannot match a word, key
+    # term or category keyword (the shortest, 'kg', has two letters), so skip scoring
+    if len(query_lower.strip()) < 2:
+        return FAQS['basic'][:max_suggestions]
+    return list(_suggested_questions(query_lower, max_suggestions))
+
+@functools.lru_cache(maxsize=1024)
+def _suggested_questions(query_lower, max_suggestions):
+    """
+    Suggested questions for a lowercased query.
+    
+    FAQs are static, so results are cached per (query, max_suggestions) and returned
+    as a tuple so the cached value cannot be modified by callers.
+    """
     suggestions = []
-    scored_suggestions = []
     
     # Extract key terms from query
     query_words = set([w for w in query_lower.split() if len(w) > 3])
     
-    # Score each FAQ based on relevance
-    for faq in FAQS['all']:
-        faq_lower = faq.lower()
-        score = 0
-        
-        # Word overlap score
-        faq_words = set([w for w in faq_lower.split() if len(w) > 3])
-        common_words = query_words.intersection(faq_words)
-        score += len(common_words) * 10
-        
-        # Phrase matching (higher score)
-        for word in query_words:
-            if word in faq_lower:
+    # Word overlap score (10 per shared word)
+    word_weights = np.zeros(len(_FAQ_WORD_COLUMNS), dtype=np.int32)
+    for word in query_words:
+        col = _FAQ_WORD_COLUMNS.get(word)
+        if col is not None:
+            word_weights[col] = 10
+    
+    # Enhanced semantic similarity for key terms: 25 per key term in both query and FAQ
+    # (a term listed twice counts twice), plus 15 if the FAQ contains a related term
+    # (e.g., "weight" matches "weight per case")
+    term_weights = np.zeros(2 * len(_FAQ_TERM_COLUMNS), dtype=np.int32)
+    for term in KEY_TERMS:
+        if term in query_lower:
+            col = _FAQ_TERM_COLUMNS[term]
+            term_weights[col] += 25
+            if term in RELATED_TERMS:
+                term_weights[len(_FAQ_TERM_COLUMNS) + col] = 15
+    
+    scores = _FAQ_WORD_MATRIX @ word_weights + _FAQ_TERM_MATRIX @ term_weights
+    
+    # Phrase matching (higher score)
+    for word in query_words:
+        for i, faq_lower in enumerate(_FAQ_LC):
+            position = faq_lower.find(word)
+            if position != -1:
                 # Check if it's at the beginning (higher relevance)
-                if faq_lower.find(word) < 20:
-                    score += 15
-                else:
-                    score += 5
-        
-        # Enhanced semantic similarity for key terms (expanded list)
-        key_terms = ['cost', 'price', 'money', 'rupee', 'transportation cost',
-                     'weight', 'kg', 'kilogram', 'ton', 'tonne',
-                     'volume', 'cubic', 'fill',
-                     'consignment', 'consignments', 'order', 'orders',
-                     'transportation', 'mode', 'vehicle', 'truck',
-                     'destination', 'source', 'location', 'locations',
-                     'product', 'products', 'customer', 'customers',
-                     'utilization', 'percentage', 'fill',
-                     'cases', 'case', 'mrp', 'value',
-                     'dispatch', 'arrival', 'date', 'dates',
-                     'missing', 'null', 'empty', 'data type', 'types']
-        for term in key_terms:
-            if term in query_lower and term in faq_lower:
-                score += 25  # Increased weight for keyword matches
-        
-        # Also match partial keywords (e.g., "weight" matches "weight per case")
-        for term in key_terms:
-            if term in query_lower:
-                # Check if FAQ contains related terms
-                related_terms = {
-                    'weight': ['weight', 'kg', 'kilogram', 'ton'],
-                    'cost': ['cost', 'price', 'rupee', 'transportation'],
-                    'volume': ['volume', 'cubic', 'fill'],
-                    'product': ['product', 'items'],
-                    'customer': ['customer', 'clients'],
-                    'consignment': ['consignment', 'order', 'shipment'],
-                    'source': ['source', 'origin'],
-                    'destination': ['destination', 'delivery'],
-                    'mode': ['mode', 'transportation', 'vehicle', 'truck']
-                }
-                if term in related_terms:
-                    for related in related_terms[term]:
-                        if related in faq_lower:
-                            score += 15
-                            break
-        
-        if score > 0:
-            scored_suggestions.append((score, faq))
+                scores[i] += 15 if position < 20 else 5
     
-    # Sort by score and get top suggestions
-    scored_suggestions.sort(key=lambda x: x[0], reverse=True)
-    suggestions = [faq for score, faq in scored_suggestions[:max_suggestions]]
+    # Keep the top suggestions by score (stable sort, so ties keep FAQ order)
+    matched = np.flatnonzero(scores > 0)
+    top = matched[np.argsort(-scores[matched], kind='stable')[:max_suggestions]]
+    suggestions = [FAQS['all'][i] for i in top]
     
     # If no matches, return some general ones based on query type (enhanced matching)
     if not suggestions:
         query_words_lower = set(query_lower.split())
         
         if any(word in query_words_lower for word in ['cost', 'price', 'money', 'rupee', 'transportation']):
-            suggestions = [q for q in FAQS['all'] if any(t in q.lower() for t in ['cost', 'price', 'transportation'])][:max_suggestions]
+            suggestions = _faqs_containing(['cost', 'price', 'transportation'], max_suggestions)
         elif any(word in query_words_lower for word in ['weight', 'kg', 'kilogram', 'ton', 'tonne']):
-            suggestions = [q for q in FAQS['all'] if 'weight' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['weight'], max_suggestions)
         elif any(word in query_words_lower for word in ['volume', 'cubic', 'fill']):
-            suggestions = [q for q in FAQS['all'] if 'volume' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['volume'], max_suggestions)
         elif any(word in query_words_lower for word in ['consignment', 'order', 'shipment']):
-            suggestions = [q for q in FAQS['all'] if any(t in q.lower() for t in ['consignment', 'order'])][:max_suggestions]
+            suggestions = _faqs_containing(['consignment', 'order'], max_suggestions)
         elif any(word in query_words_lower for word in ['product', 'item', 'items']):
-            suggestions = [q for q in FAQS['all'] if 'product' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['product'], max_suggestions)
         elif any(word in query_words_lower for word in ['customer', 'client']):
-            suggestions = [q for q in FAQS['all'] if 'customer' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['customer'], max_suggestions)
         elif any(word in query_words_lower for word in ['source', 'origin']):
-            suggestions = [q for q in FAQS['all'] if 'source' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['source'], max_suggestions)
         elif any(word in query_words_lower for word in ['destination', 'delivery']):
-            suggestions = [q for q in FAQS['all'] if 'destination' in q.lower()][:max_suggestions]
+            suggestions = _faqs_containing(['destination'], max_suggestions)
         else:
             suggestions = FAQS['basic'][:max_suggestions]
     
-    return suggestions
+    return tuple(suggestions)
 
 def get_auto_complete_suggestions(partial_query, max_suggestions=5):
     """
@@ -614,11 +1146,19 @@ def get_auto_complete_suggestions(partial_query, max_suggestions=5):
         return []
     
     partial_lower = partial_query.lower().strip()
+    
+    # Prefix matches outscore every other match and tie with each other, so when there
+    # are enough of them they are the result (in FAQ order) without scoring anything
+    prefix_matches = _faq_prefix_matches(partial_lower)
+    if len(prefix_matches) >= max_suggestions:
+        return [FAQS['all'][i] for i in prefix_matches[:max_suggestions]]
+    
     scored_matches = []
+    partial_words = [w for w in partial_lower.split() if len(w) > 2]
+    partial_keywords = _find_keywords(partial_lower)
     
     # Score matches based on relevance
-    for faq in FAQS['all']:
-        faq_lower = faq.lower()
+    for faq, faq_lower, faq_words, faq_keywords in _FAQ_INDEX:
         score = 0
         
         # Exact prefix match gets highest score
@@ -635,8 +1175,6 @@ def get_auto_complete_suggestions(partial_query, max_suggestions=5):
             score = 50
         # Word-based matching - check if all words in partial query appear in FAQ
         else:
-            partial_words = [w for w in partial_lower.split() if len(w) > 2]
-            faq_words = set(faq_lower.split())
             matching_words = [w for w in partial_words if w in faq_words]
             if matching_words:
                 # Higher score if more words match
@@ -645,34 +1183,15 @@ def get_auto_complete_suggestions(partial_query, max_suggestions=5):
                 if len(matching_words) == len(partial_words):
                     score += 10
         
-        # Enhanced keyword matching - expanded list with related terms
-        key_terms_map = {
-            'cost': ['cost', 'price', 'money', 'rupee', 'transportation cost', 'mrp', 'value'],
-            'weight': ['weight', 'kg', 'kilogram', 'ton', 'tonne', 'weight per case'],
-            'volume': ['volume', 'cubic', 'fill', 'volume fill', 'utilization'],
-            'consignment': ['consignment', 'order', 'orders', 'shipment', 'shipments'],
-            'transportation': ['transportation', 'mode', 'modes', 'vehicle', 'truck', 'transport'],
-            'product': ['product', 'products', 'item', 'items', 'sku'],
-            'customer': ['customer', 'customers', 'client', 'clients'],
-            'source': ['source', 'sources', 'origin', 'origins', 'source location', 'source locations'],
-            'destination': ['destination', 'destinations', 'delivery', 'destination location', 'destination locations'],
-            'case': ['case', 'cases', 'no of cases', 'total cases'],
-            'location': ['location', 'locations', 'source location', 'destination location']
-        }
-        
-        # Check if query contains any keyword and FAQ contains related terms
-        for keyword, related_terms in key_terms_map.items():
-            if any(term in partial_lower for term in related_terms):
-                if any(term in faq_lower for term in related_terms):
-                    score += 25  # Higher score for keyword matches
-                    break
+        # Enhanced keyword matching: query and FAQ both mention a term from the same group
+        if not partial_keywords.isdisjoint(faq_keywords):
+            score += 25  # Higher score for keyword matches
         
         if score > 0:
             scored_matches.append((score, faq))
     
-    # Sort by score and return top matches
-    scored_matches.sort(key=lambda x: x[0], reverse=True)
-    matches = [faq for score, faq in scored_matches[:max_suggestions]]
+    # Return top matches by score (nlargest keeps FAQ order on ties, like a stable sort)
+    matches = [faq for score, faq in heapq.nlargest(max_suggestions, scored_matches, key=lambda x: x[0])]
     
     return matches
 
@@ -680,6 +1199,8 @@ def initialize_rag_system():
     """Initialize RAG system (legacy for backward compatibility)."""
     global rag_system
     try:
+        # Imported here so chromadb/sentence-transformers load only when the system is built
+        from excel_to_rag import ExcelToRAG
         db_path = os.path.join(os.getcwd(), 'chroma_db')
         rag_system = ExcelToRAG(
             embedding_model="all-MiniLM-L6-v2",
@@ -695,6 +1216,8 @@ def initialize_rag_pipeline():
     """Initialize unified RAG pipeline."""
     global rag_pipeline, rag_ingestion
     try:
+        from rag_pipeline import RAGPipeline
+        from rag_ingestion import RAGIngestion
         db_path = os.path.join(os.getcwd(), 'chroma_db')
         rag_pipeline = RAGPipeline(
             embedding_model="all-MiniLM-L6-v2",
@@ -722,6 +1245,7 @@ def initialize_query_pipeline():
     """
     global query_pipeline
     try:
+        from query_driven_pipeline import QueryDrivenPipeline
         query_pipeline = QueryDrivenPipeline()
         logger.info("Query-driven analytics pipeline initialized")
         logger.info("Rule-based query engine (primary)")
@@ -778,29 +1302,25 @@ def greet():
         'has_data': has_data
     })
 
+# Common greetings
+GREETINGS = frozenset([
+    'hi', 'hello', 'hey', 'hi there', 'hello there', 'hey there',
+    'good morning', 'good afternoon', 'good evening', 'good night',
+    'greetings', 'howdy', 'what\'s up', 'whats up', 'sup',
+    'good day', 'morning', 'afternoon', 'evening'
+])
+
 def is_greeting(query):
     """Check if query is a greeting."""
     query_lower = query.lower().strip()
     
-    # Common greetings
-    greetings = [
-        'hi', 'hello', 'hey', 'hi there', 'hello there', 'hey there',
-        'good morning', 'good afternoon', 'good evening', 'good night',
-        'greetings', 'howdy', 'what\'s up', 'whats up', 'sup',
-        'good day', 'morning', 'afternoon', 'evening'
-    ]
-    
-    # Check for exact matches or starts with greeting
-    if query_lower in greetings:
+    # Check for exact matches
+    if query_lower in GREETINGS:
         return True
     
-    # Check if query starts with a greeting followed by optional punctuation
-    for greeting in greetings:
-        if query_lower.startswith(greeting):
-            # Check if it's just the greeting or greeting + punctuation/whitespace
-            remaining = query_lower[len(greeting):].strip()
-            if not remaining or remaining in ['.', '!', '?', ',']:
-                return True
+    # Check for a greeting followed by a single punctuation mark (e.g. "hello!", "hi .")
+    if query_lower.endswith(('.', '!', '?', ',')):
+        return query_lower[:-1].rstrip() in GREETINGS
     
     return False
 
@@ -862,9 +1382,9 @@ def query():
                 'answer': 'Please wait while the system initializes...'
             }), 503
         
-        # Step 3: Check if files are loaded
-        stats = query_pipeline.get_stats()
-        total_files = stats.get('total_files', 0)
+        # Step 3: Check if files are loaded (get_stats() would also build per-file schema
+        # summaries and sum row counts, which this check does not need)
+        total_files = len(query_pipeline.data_loader.dataframes)
         
         if total_files == 0:
             error_msg = 'No files loaded. Please upload and process at least one Excel/CSV file first.'
@@ -884,8 +1404,8 @@ def query():
         try:
             logger.info(f"Processing query: {query_text}")
             
-            # Process through query-driven pipeline
-            result = query_pipeline.process_query(query_text)
+            # Process through query-driven pipeline (repeated queries are served from cache)
+            result = _process_query_cached(query_text)
             
             answer = result.get('answer', '')
             success = result.get('success', False)
@@ -911,7 +1431,6 @@ def query():
         
         except Exception as e:
             print(f"Error querying pipeline: {str(e)}")
-            import traceback
             traceback.print_exc()
             return jsonify({
                 'error': str(e),
@@ -940,15 +1459,72 @@ def query():
         })
         
     except Exception as e:
-        import traceback
         error_trace = traceback.format_exc()
         print(f"ERROR in /api/query: {str(e)}")
         print(f"Traceback: {error_trace}")
-        return jsonify({
+        return jsonify(_with_traceback({
             'error': str(e),
-            'answer': f'I encountered an error processing your query: {str(e)}. Please make sure files are uploaded and processed.',
-            'traceback': error_trace
-        }), 500
+            'answer': f'I encountered an error processing your query: {str(e)}. Please make sure files are uploaded and processed.'
+        }, error_trace)), 500
+
+# Phrases marking a query that asks for a list (no single numeric answer is shown)
+LIST_QUERY_PHRASES = [
+    'what are all', 'what are the', 'list', 'show me', 'all the', 
+    'different', 'unique', 'column names', 'column name',
+    'source locations', 'destination locations', 'products',
+    'transportation modes', 'load types', 'customers',
+    'consignment numbers', 'dates', 'date range', 'names'
+]
+_is_list_query = _build_keyword_matcher(LIST_QUERY_PHRASES)
+
+# Patterns used to clean up answer text (compiled once, applied to every answer)
+SEPARATOR_DASH_PATTERN = re.compile(r'-{3,}')
+SEPARATOR_EQUALS_PATTERN = re.compile(r'={3,}')
+# np.float64(value), np.int64(value), ... -> value
+NUMPY_SCALAR_PATTERN = re.compile(r'np\.\w+\(([^)]+)\)')
+# Boundaries between a number (optionally ending in '.') and a letter, in either order
+NUMBER_LETTER_BOUNDARY_PATTERN = re.compile(r'(?<=\d)(?=[a-zA-Z])|(?<=\d\.)(?=[a-zA-Z])|(?<=[a-zA-Z])(?=\d)')
+DECIMAL_PATTERN = re.compile(r'\b\d+\.\d+\b')
+MULTI_SPACE_PATTERN = re.compile(r' {2,}')
+MULTI_NEWLINE_PATTERN = re.compile(r'\n{3,}')
+MULTI_TAB_PATTERN = re.compile(r'\t+')
+
+def _alternation(patterns):
+    """Combine regex patterns into one pattern that matches wherever any of them would."""
+    return re.compile('|'.join(f'(?:{pattern})' for pattern in patterns))
+
+# Lines that are clearly not data-related (greetings, random text)
+ANSWER_SKIP_LINE_PATTERN = _alternation([
+    r'^(hi|hello|hey|bro|dude|man)\s+',
+    r'\b(how are you|what\'?s up|sup|wassup)\b',
+    r'^(thanks|thank you|thx)',
+    r'^(ok|okay|alright|sure|yeah|yes|no)\s*$'
+])
+CONTENT_SKIP_LINE_PATTERN = _alternation([
+    r'^(hi|hello|hey|bro|dude|man|sup)\s+',
+    r'\b(how are you|what\'?s up|wassup|how\'?s it going)\b',
+    r'^(thanks|thank you|thx|ty)\s*',
+    r'^(ok|okay|alright|sure|yeah|yes|no|yep|nope)\s*$',
+    r'^(lol|haha|hehe|lmao)',
+    r'^\W+$'  # Lines that are only punctuation/symbols
+])
+# A skip pattern can only match a line that starts with one of these words, contains one
+# of these substrings, or starts with a symbol, so other lines skip the regex entirely
+ANSWER_SKIP_PREFIXES = ('hi', 'hello', 'hey', 'bro', 'dude', 'man', 'thanks', 'thank you', 'thx',
+                        'ok', 'okay', 'alright', 'sure', 'yeah', 'yes', 'no')
+ANSWER_SKIP_INFIXES = ('how', 'what', 'sup')
+CONTENT_SKIP_PREFIXES = ('hi', 'hello', 'hey', 'bro', 'dude', 'man', 'sup', 'thanks', 'thank you', 'thx', 'ty',
+                         'ok', 'okay', 'alright', 'sure', 'yeah', 'yes', 'no', 'yep', 'nope',
+                         'lol', 'haha', 'hehe', 'lmao')
+CONTENT_SKIP_INFIXES = ('how', 'what', 'wassup')
+
+def _is_skip_line(line_lower, pattern, prefixes, infixes):
+    """Check whether a stripped, lowercased, non-empty line matches a skip-line pattern."""
+    first = line_lower[0]
+    if (line_lower.startswith(prefixes) or not (first.isalnum() or first == '_')
+            or any(infix in line_lower for infix in infixes)):
+        return pattern.search(line_lower) is not None
+    return False
 
 def format_answer(query, results, numeric_value):
     """Format the answer from results."""
@@ -963,13 +1539,7 @@ def format_answer(query, results, numeric_value):
         query_lower = query.lower()
         
         # Don't show numeric value for list queries
-        is_list_query = any(phrase in query_lower for phrase in [
-            'what are all', 'what are the', 'list', 'show me', 'all the', 
-            'different', 'unique', 'column names', 'column name',
-            'source locations', 'destination locations', 'products',
-            'transportation modes', 'load types', 'customers',
-            'consignment numbers', 'dates', 'date range', 'names'
-        ])
+        is_list_query = _is_list_query(query_lower)
         
         if not is_list_query:
             # Format numeric value properly
@@ -997,8 +1567,7 @@ def format_answer(query, results, numeric_value):
             
             # Remove any remaining artifacts or malformed content
             # Remove content that looks like concatenated text without spaces
-            content = re.sub(r'(\d+\.?\d*)([a-zA-Z])', r'\1 \2', content)  # Add space between number and letter
-            content = re.sub(r'([a-zA-Z])(\d+\.?\d*)', r'\1 \2', content)  # Add space between letter and number
+            content = NUMBER_LETTER_BOUNDARY_PATTERN.sub(' ', content)  # Add space between numbers and letters
             
             # Remove any random text that doesn't belong (like "bro how are you")
             # This is a heuristic - remove lines that are clearly not data-related
@@ -1015,20 +1584,7 @@ def format_answer(query, results, numeric_value):
                     continue
                 
                 # Skip lines that are clearly not data-related (greetings, random text)
-                line_lower = line.lower()
-                skip_patterns = [
-                    r'^(hi|hello|hey|bro|dude|man)\s+',
-                    r'\b(how are you|what\'?s up|sup|wassup)\b',
-                    r'^(thanks|thank you|thx)',
-                    r'^(ok|okay|alright|sure|yeah|yes|no)\s*$'
-                ]
-                should_skip = False
-                for pattern in skip_patterns:
-                    if re.search(pattern, line_lower):
-                        should_skip = True
-                        break
-                
-                if not should_skip:
+                if not _is_skip_line(line.lower(), ANSWER_SKIP_LINE_PATTERN, ANSWER_SKIP_PREFIXES, ANSWER_SKIP_INFIXES):
                     cleaned_lines.append(line)
             
             content = '\n'.join(cleaned_lines).strip()
@@ -1044,11 +1600,24 @@ def format_answer(query, results, numeric_value):
     
     # Final cleanup - remove duplicate headers, empty rows, fix formatting
     final_answer = remove_duplicate_headers(final_answer)
-    final_answer = re.sub(r' {2,}', ' ', final_answer)  # Multiple spaces to single
-    final_answer = re.sub(r'\n{3,}', '\n\n', final_answer)  # Multiple newlines to double
+    final_answer = MULTI_SPACE_PATTERN.sub(' ', final_answer)  # Multiple spaces to single
+    final_answer = MULTI_NEWLINE_PATTERN.sub('\n\n', final_answer)  # Multiple newlines to double
     
     return final_answer
 
+def _clean_decimal(match):
+    """
+    Clean up trailing zeros in a decimal number (e.g., 25.0 -> 25, 10.5 -> 10.5).
+    
+    Scientific notation is preserved.
+    """
+    num = match.group(0)
+    if '.' in num and 'e' not in num.lower():
+        # Remove trailing zeros and decimal point if needed
+        cleaned = num.rstrip('0').rstrip('.')
+        return cleaned if cleaned else num
+    return num
+
 def clean_markdown_content(content):
     """Clean markdown content for display."""
     if not content:
@@ -1058,162 +1627,101 @@ def clean_markdown_content(content):
     content = str(content)
     
     # Remove excessive separators
-    content = re.sub(r'-{3,}', '', content)
-    content = re.sub(r'={3,}', '', content)
+    content = SEPARATOR_DASH_PATTERN.sub('', content)
+    content = SEPARATOR_EQUALS_PATTERN.sub('', content)
     
     # Remove numpy type annotations - match np.float64(value), np.int64(value), etc.
     # Pattern: np.type(value) -> value
-    # Handle common numpy types first
-    content = re.sub(r'np\.float64\(([^)]+)\)', r'\1', content)
-    content = re.sub(r'np\.int64\(([^)]+)\)', r'\1', content)
-    content = re.sub(r'np\.float32\(([^)]+)\)', r'\1', content)
-    content = re.sub(r'np\.int32\(([^)]+)\)', r'\1', content)
-    content = re.sub(r'np\.float\(([^)]+)\)', r'\1', content)
-    content = re.sub(r'np\.int\(([^)]+)\)', r'\1', content)
-    # Generic numpy type removal (catches any remaining np.type(value) patterns)
-    content = re.sub(r'np\.\w+\(([^)]+)\)', r'\1', content)
+    content = NUMPY_SCALAR_PATTERN.sub(r'\1', content)
     
     # Fix spacing issues - add space between numbers and letters
-    content = re.sub(r'(\d+\.?\d*)([a-zA-Z])', r'\1 \2', content)
-    content = re.sub(r'([a-zA-Z])(\d+\.?\d*)', r'\1 \2', content)
+    content = NUMBER_LETTER_BOUNDARY_PATTERN.sub(' ', content)
     
-    # Remove random text artifacts (greetings, casual text that shouldn't be in data)
-    lines = content.split('\n')
+    # Clean the content line by line in a single pass (every cleanup rule below is
+    # confined to one line, so no intermediate joined copies are needed)
     cleaned_lines = []
-    for line in lines:
+    for line in content.split('\n'):
         line = line.strip()
-        if not line:
-            cleaned_lines.append('')
-            continue
-        
-        # Skip empty table rows (just separators or pipes)
-        if line == '|||' or line == '|' or (line.startswith('|') and line.endswith('|') and len([p for p in line.split('|') if p.strip()]) <= 1):
-            continue
-        
-        # Skip lines that are clearly not data-related
-        line_lower = line.lower()
-        skip_patterns = [
-            r'^(hi|hello|hey|bro|dude|man|sup)\s+',
-            r'\b(how are you|what\'?s up|wassup|how\'?s it going)\b',
-            r'^(thanks|thank you|thx|ty)\s*',
-            r'^(ok|okay|alright|sure|yeah|yes|no|yep|nope)\s*$',
-            r'^(lol|haha|hehe|lmao)',
-            r'^\W+$'  # Lines that are only punctuation/symbols
-        ]
-        
-        should_skip = False
-        for pattern in skip_patterns:
-            if re.search(pattern, line_lower):
-                should_skip = True
-                break
-        
-        if not should_skip:
-            # Clean up the line
+        if line:
+            # Skip empty table rows (just separators or pipes)
+            if line == '|||' or line == '|' or (line.startswith('|') and line.endswith('|') and len([p for p in line.split('|') if p.strip()]) <= 1):
+                continue
+            
+            # Remove random text artifacts (greetings, casual text that shouldn't be in data)
+            if _is_skip_line(line.lower(), CONTENT_SKIP_LINE_PATTERN, CONTENT_SKIP_PREFIXES, CONTENT_SKIP_INFIXES):
+                continue
+            
             # Remove excessive spaces
-            line = re.sub(r' {2,}', ' ', line)
+            line = MULTI_SPACE_PATTERN.sub(' ', line)
             # Fix tab-separated values
             if '\t' in line and 'np.' in line:
-                parts = line.split('\t')
-                cleaned_parts = []
-                for part in parts:
-                    cleaned_part = re.sub(r'np\.\w+\(([^)]+)\)', r'\1', part)
-                    cleaned_parts.append(cleaned_part)
-                line = '\t'.join(cleaned_parts)
+                line = '\t'.join(NUMPY_SCALAR_PATTERN.sub(r'\1', part) for part in line.split('\t'))
             
-            cleaned_lines.append(line)
-    
-    content = '\n'.join(cleaned_lines)
-    
-    # Clean up trailing zeros in decimal numbers (e.g., 25.0 -> 25, 10.5 -> 10.5)
-    # But preserve scientific notation
-    def clean_decimal(match):
-        num = match.group(0)
-        if '.' in num and 'e' not in num.lower():
-            # Remove trailing zeros and decimal point if needed
-            cleaned = num.rstrip('0').rstrip('.')
-            return cleaned if cleaned else num
-        return num
-    
-    # Clean decimals in tables and text
-    content = re.sub(r'\b\d+\.\d+\b', clean_decimal, content)
-    
-    # Clean up extra whitespace and newlines
-    content = re.sub(r' {2,}', ' ', content)  # Multiple spaces to single
-    content = re.sub(r'\n{3,}', '\n\n', content)  # Multiple newlines to double
-    content = re.sub(r'\t+', '\t', content)  # Multiple tabs to single
-    
-    # Remove leading/trailing whitespace from each line
-    lines = content.split('\n')
-    cleaned_lines = []
-    for line in lines:
-        cleaned_line = line.strip()
+            # Clean decimals in tables and text
+            line = DECIMAL_PATTERN.sub(_clean_decimal, line)
+            
+            # Clean up extra whitespace
+            line = MULTI_SPACE_PATTERN.sub(' ', line)  # Multiple spaces to single
+            line = MULTI_TAB_PATTERN.sub('\t', line)  # Multiple tabs to single
+            line = line.strip()
+        
         # Skip lines that are just artifacts
-        if cleaned_line and len(cleaned_line) > 2:
-            cleaned_lines.append(cleaned_line)
-        elif not cleaned_line:
+        if len(line) > 2:
+            cleaned_lines.append(line)
+        elif not line:
             # Keep empty lines for spacing, but limit consecutive empty lines
             if not cleaned_lines or cleaned_lines[-1] != '':
                 cleaned_lines.append('')
     
-    content = '\n'.join(cleaned_lines)
-    
-    return content.strip()
+    return '\n'.join(cleaned_lines).strip()
+
+# Common section headers (besides markdown # headers) that should not repeat
+SECTION_HEADERS = frozenset([
+    'column information', 'description', 'details', 'data preview', 'complete data',
+    'row-by-row data', 'numeric summary statistics', 'complete table view'
+])
+# Headers that are also dropped when repeated on consecutive lines
+CONSECUTIVE_HEADERS = frozenset(['column information', 'description'])
 
 def remove_duplicate_headers(content):
     """Remove duplicate section headers from content."""
     if not content:
         return content
     
-    lines = content.split('\n')
     cleaned = []
     seen_headers = {}
     last_header_line = -10  # Track position of last header
+    prev_header = None  # Previous kept line, if it was one of CONSECUTIVE_HEADERS
     
-    for i, line in enumerate(lines):
+    for i, line in enumerate(content.split('\n')):
         line_stripped = line.strip()
+        line_lower = line_stripped.lower()
         
         # Check if this is a header (starts with # or is "Column Information", etc.)
-        is_header = False
-        header_key = None
-        
-        if line_stripped.startswith('#'):
-            # Markdown header
-            header_key = line_stripped.lower()
-            is_header = True
-        elif line_stripped.lower() in ['column information', 'description', 'details', 'data preview', 'complete data', 'row-by-row data', 'numeric summary statistics', 'complete table view']:
-            # Common section headers
-            header_key = line_stripped.lower()
-            is_header = True
-        
-        if is_header and header_key:
+        is_header = line_stripped.startswith('#') or line_lower in SECTION_HEADERS
+        
+        if is_header:
             # Check if we've seen this header recently (within last 5 lines)
-            if header_key in seen_headers and (i - seen_headers[header_key]) < 5:
+            if line_lower in seen_headers and (i - seen_headers[line_lower]) < 5:
                 # Skip duplicate header that's too close
                 continue
-            seen_headers[header_key] = i
+            seen_headers[line_lower] = i
             last_header_line = i
-        
-        # Reset header tracking if we've moved far from headers
-        if not is_header and line_stripped and (i - last_header_line) > 10:
-            # Clear old header tracking
-            seen_headers = {}
-        
-        cleaned.append(line)
-    
-    # Also remove consecutive duplicate headers
-    final_cleaned = []
-    prev_header = None
-    for line in cleaned:
-        line_stripped = line.strip().lower()
-        if line_stripped in ['column information', 'description'] and prev_header == line_stripped:
-            continue  # Skip consecutive duplicate
-        if line_stripped in ['column information', 'description']:
-            prev_header = line_stripped
+        elif line_stripped and (i - last_header_line) > 10:
+            # Reset header tracking if we've moved far from headers
+            seen_headers.clear()
+        
+        # Also remove consecutive duplicate headers
+        if line_lower in CONSECUTIVE_HEADERS:
+            if prev_header == line_lower:
+                continue  # Skip consecutive duplicate
+            prev_header = line_lower
         else:
             prev_header = None
-        final_cleaned.append(line)
+        
+        cleaned.append(line)
     
-    return '\n'.join(final_cleaned)
+    return '\n'.join(cleaned)
 
 @app.route('/api/autocomplete', methods=['POST'])
 def autocomplete():
@@ -1262,16 +1770,17 @@ def list_files():
         files = []
         
         try:
-            for filename in os.listdir(folder_path):
-                file_path = os.path.join(folder_path, filename)
-                if os.path.isfile(file_path) and filename.lower().endswith(excel_extensions):
-                    is_loaded = file_path in loaded_files
-                    files.append({
-                        'filename': filename,
-                        'path': file_path,
-                        'loaded': is_loaded,
-                        'size': os.path.getsize(file_path)
-                    })
+            # scandir reuses the directory entry's file type, so only the size needs a stat
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    if entry.name.lower().endswith(excel_extensions) and entry.is_file():
+                        is_loaded = entry.path in loaded_files
+                        files.append({
+                            'filename': entry.name,
+                            'path': entry.path,
+                            'loaded': is_loaded,
+                            'size': entry.stat().st_size
+                        })
         except Exception as e:
             return jsonify({
                 'error': f'Error reading folder: {str(e)}',
@@ -1290,6 +1799,173 @@ def list_files():
     except Exception as e:
         return jsonify({'error': str(e), 'files': []}), 500
 
+# Maximum number of files loaded concurrently by /api/files/process
+MAX_PROCESS_WORKERS = 8
+# Files already loaded into the query pipeline, so resubmitting unchanged files is a no-op:
+# {(sha1 of contents, file name, process_all_sheets): (success result entry, data loader file ids)}
+_loaded_file_hashes = {}
+# Content hash each data loader file id currently holds: {file_id: sha1}
+_file_id_hashes = {}
+_loaded_file_hashes_lock = threading.Lock()
+
+def _file_sha1(file_path):
+    """SHA-1 of a file's contents, read in UPLOAD_CHUNK_SIZE blocks."""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _find_loaded_file(key):
+    """Return the result entry for a previously loaded file if its data is still loaded unchanged."""
+    with _loaded_file_hashes_lock:
+        entry = _loaded_file_hashes.get(key)
+        if entry is None:
+            return None
+        result, loaded_file_ids = entry
+        # Another file may have replaced the data since (e.g. data_Sheet1.csv over a data.xlsx sheet)
+        if any(_file_id_hashes.get(file_id) != key[0] for file_id in loaded_file_ids):
+            del _loaded_file_hashes[key]
+            return None
+        return result
+
+def _process_file(file_path, process_all_sheets):
+    """Validate one selected file and load it into the query-driven pipeline, returning its result entry."""
+    filename = 'unknown'
+    try:
+        # Validate and sanitize file path
+        if not file_path or not isinstance(file_path, str):
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': 'Invalid file path provided'
+            }
+        
+        # Prevent path traversal attacks
+        file_path = os.path.normpath(file_path)
+        filename = os.path.basename(file_path)
+        if '..' in file_path or file_path.startswith('/'):
+            # Only allow relative paths in allowed directories
+            if not any(file_path.startswith(allowed_dir) for allowed_dir in [settings.get('files_folder_path', ''), os.getcwd()]):
+                return {
+                    'file': filename,
+                    'status': 'error',
+                    'message': 'Invalid file path: path traversal not allowed'
+                }
+        
+        # One stat call answers existence, file type and size
+        try:
+            file_stat = os.stat(file_path)
+        except FileNotFoundError:
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': f'File not found: {file_path}'
+            }
+        except OSError as e:
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': f'Cannot access file: {str(e)}'
+            }
+        
+        if not stat.S_ISREG(file_stat.st_mode):
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': 'Path is not a file'
+            }
+        
+        # Check file size before processing
+        file_size = file_stat.st_size
+        if file_size > MAX_FILE_SIZE:
+            size_mb = MAX_FILE_SIZE / (1024 * 1024)
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': f'File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size of {size_mb}MB'
+            }
+        
+        # Skip files whose contents are already loaded (e.g. the same selection resubmitted)
+        content_key = (_file_sha1(file_path), filename, bool(process_all_sheets))
+        previous = _find_loaded_file(content_key)
+        if previous is not None:
+            logger.info(f"Skipping {filename}: already loaded and unchanged")
+            loaded_files.add(file_path)
+            return dict(previous, message='Already loaded (unchanged)', skipped=True)
+        
+        # Load file into query-driven pipeline
+        logger.info(f"Loading file: {filename}")
+        load_result = query_pipeline.load_file(
+            file_path, 
+            file_id=None,  # Auto-generate from filename
+            process_all_sheets=process_all_sheets
+        )
+        
+        if load_result.get('success'):
+            loaded_files.add(file_path)
+            
+            # Get file info
+            file_ids = load_result.get('file_ids', [load_result.get('file_id')])
+            rows = load_result.get('rows', 0)
+            columns = load_result.get('columns', 0)
+            
+            logger.info(f"Loaded {filename}: {rows} rows, {columns} columns")
+            result = {
+                'file': filename,
+                'status': 'success',
+                'message': load_result.get('message', 'Loaded successfully'),
+                'rows': rows,
+                'columns': columns,
+                'file_ids': file_ids
+            }
+            loaded_file_ids = load_result.get('loaded_file_ids', file_ids)
+            with _loaded_file_hashes_lock:
+                for file_id in loaded_file_ids:
+                    _file_id_hashes[file_id] = content_key[0]
+                _loaded_file_hashes[content_key] = (result, loaded_file_ids)
+            return result
+        else:
+            error_msg = load_result.get('error', 'Unknown error')
+            logger.error(f"Error loading {filename}: {error_msg}")
+            return {
+                'file': filename,
+                'status': 'error',
+                'message': error_msg
+            }
+        
+    except Exception as e:
+        error_msg = str(e)
+        logger.error(f"ERROR processing {filename}: {error_msg}")
+        error_trace = _debug_traceback()
+        return _with_traceback({
+            'file': filename,
+            'status': 'error',
+            'message': error_msg
+        }, error_trace)
+
+def _file_id_groups(file_paths):
+    """
+    Group indices into file_paths by the file ids their files can load into, in request order.
+    
+    A file's id is its stem and a sheet's id is "{stem}_{sheet}", so data.xlsx and
+    data_Sheet1.csv can both write data_Sheet1: any stem that starts with another
+    requested stem plus "_" joins that stem's group.
+    """
+    stems = {
+        index: os.path.splitext(os.path.basename(file_path))[0]
+        for index, file_path in enumerate(file_paths) if isinstance(file_path, str)
+    }
+    roots = {}
+    for stem in sorted(set(stems.values()), key=len):
+        roots[stem] = next((roots[other] for other in roots if stem.startswith(other + '_')), stem)
+    
+    groups = OrderedDict()
+    for index in range(len(file_paths)):
+        key = roots[stems[index]] if index in stems else index
+        groups.setdefault(key, []).append(index)
+    return list(groups.values())
+
 @app.route('/api/files/process', methods=['POST'])
 def process_files():
     """
@@ -1317,116 +1993,25 @@ def process_files():
         if not query_pipeline:
             return jsonify({'error': 'Query pipeline not initialized'}), 503
         
-        results = []
-        total_processed = 0
+        # Load files in parallel (pandas file parsing releases the GIL). Files that can write
+        # the same file id load in request order within one task, so the last one wins.
+        groups = _file_id_groups(file_paths)
+        loaded_files_before = len(loaded_files)
         
-        for file_path in file_paths:
-            try:
-                # Validate and sanitize file path
-                if not file_path or not isinstance(file_path, str):
-                    results.append({
-                        'file': 'unknown',
-                        'status': 'error',
-                        'message': 'Invalid file path provided'
-                    })
-                    continue
-                
-                # Prevent path traversal attacks
-                file_path = os.path.normpath(file_path)
-                if '..' in file_path or file_path.startswith('/'):
-                    # Only allow relative paths in allowed directories
-                    if not any(file_path.startswith(allowed_dir) for allowed_dir in [settings.get('files_folder_path', ''), os.getcwd()]):
-                        results.append({
-                            'file': os.path.basename(file_path),
-                            'status': 'error',
-                            'message': 'Invalid file path: path traversal not allowed'
-                        })
-                        continue
-                
-                if not os.path.exists(file_path):
-                    results.append({
-                        'file': os.path.basename(file_path),
-                        'status': 'error',
-                        'message': f'File not found: {file_path}'
-                    })
-                    continue
-                
-                if not os.path.isfile(file_path):
-                    results.append({
-                        'file': os.path.basename(file_path),
-                        'status': 'error',
-                        'message': 'Path is not a file'
-                    })
-                    continue
-                
-                # Check file size before processing
-                try:
-                    file_size = os.path.getsize(file_path)
-                    if file_size > MAX_FILE_SIZE:
-                        size_mb = MAX_FILE_SIZE / (1024 * 1024)
-                        results.append({
-                            'file': os.path.basename(file_path),
-                            'status': 'error',
-                            'message': f'File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size of {size_mb}MB'
-                        })
-                        continue
-                except OSError as e:
-                    results.append({
-                        'file': os.path.basename(file_path),
-                        'status': 'error',
-                        'message': f'Cannot access file: {str(e)}'
-                    })
-                    continue
-                
-                filename = os.path.basename(file_path)
-                
-                # Load file into query-driven pipeline
-                logger.info(f"Loading file: {filename}")
-                load_result = query_pipeline.load_file(
-                    file_path, 
-                    file_id=None,  # Auto-generate from filename
-                    process_all_sheets=process_all_sheets
-                )
-                
-                if load_result.get('success'):
-                    loaded_files.add(file_path)
-                    total_processed += 1
-                    
-                    # Get file info
-                    file_ids = load_result.get('file_ids', [load_result.get('file_id')])
-                    rows = load_result.get('rows', 0)
-                    columns = load_result.get('columns', 0)
-                    
-                    results.append({
-                        'file': filename,
-                        'status': 'success',
-                        'message': load_result.get('message', 'Loaded successfully'),
-                        'rows': rows,
-                        'columns': columns,
-                        'file_ids': file_ids
-                    })
-                    logger.info(f"Loaded {filename}: {rows} rows, {columns} columns")
-                else:
-                    error_msg = load_result.get('error', 'Unknown error')
-                    results.append({
-                        'file': filename,
-                        'status': 'error',
-                        'message': error_msg
-                    })
-                    logger.error(f"Error loading {filename}: {error_msg}")
-                
-            except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                error_msg = str(e)
-                logger.error(f"ERROR processing {os.path.basename(file_path)}: {error_msg}")
-                logger.debug(f"Traceback: {error_trace}")
-                results.append({
-                    'file': os.path.basename(file_path),
-                    'status': 'error',
-                    'message': error_msg,
-                    'traceback': error_trace
-                })
+        def process_group(indices):
+            return [(index, _process_file(file_paths[index], process_all_sheets)) for index in indices]
+        
+        results = [None] * len(file_paths)
+        with ThreadPoolExecutor(max_workers=min(MAX_PROCESS_WORKERS, len(groups))) as executor:
+            for group_results in executor.map(process_group, groups):
+                for index, result in group_results:
+                    results[index] = result
+        
+        total_processed = sum(1 for result in results if result['status'] == 'success')
+        # A skipped file can still add a path to loaded_files (the same file in another folder)
+        if (len(loaded_files) != loaded_files_before
+                or any(result['status'] == 'success' and not result.get('skipped') for result in results)):
+            _file_columns_changed()
         
         return jsonify({
             'message': f'Processed {total_processed}/{len(file_paths)} files',
@@ -1436,16 +2021,13 @@ def process_files():
         })
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
         logger.error(f"CRITICAL ERROR in process_files endpoint: {str(e)}")
-        logger.debug(f"Traceback: {error_trace}")
-        return jsonify({
+        error_trace = _debug_traceback()
+        return jsonify(_with_traceback({
             'error': str(e),
-            'traceback': error_trace,
             'results': [],
             'total_processed': 0
-        }), 500
+        }, error_trace)), 500
 
 @app.route('/api/clear-database', methods=['POST', 'GET'])
 def clear_database():
@@ -1471,6 +2053,10 @@ def clear_database():
             # Also clear loaded_files tracking
             global loaded_files
             loaded_files.clear()
+            _uploaded_file_columns.clear()
+            with _loaded_file_hashes_lock:
+                _loaded_file_hashes.clear()
+                _file_id_hashes.clear()
             
             # Clear query pipeline data as well
             if query_pipeline:
@@ -1479,6 +2065,7 @@ def clear_database():
                     logger.info("Cleared query pipeline data")
                 except Exception as e:
                     logger.warning(f"Error clearing query pipeline data: {e}")
+            _file_columns_changed()
             
             logger.info(f"Database cleared successfully. Removed {total_before} chunks.")
             return jsonify({
@@ -1495,52 +2082,150 @@ def clear_database():
 
 @app.route('/api/database-stats', methods=['GET'])
 def database_stats():
-    """Get database statistics to diagnose issues."""
+    """
+    Get database statistics to diagnose issues.
+    
+    Pass ?deep=1 to also run a test retrieval (embeds a query and searches the collection).
+    """
     try:
         if not rag_pipeline:
             return jsonify({'error': 'RAG pipeline not initialized'}), 503
         
+        # The stats only change when files are loaded or cleared, so answer repeat polls
+        # with 304 Not Modified (the retrieval test is not cached)
+        deep = request.args.get('deep', '').lower() in ('1', 'true')
+        etag = f"{_DATA_VERSION_TOKEN}-{_data_version}"
+        if not deep and request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        
         stats = rag_pipeline.get_stats()
         
         # Also try to get a sample chunk to verify data is accessible
         sample_chunk = None
         try:
-            all_data = rag_pipeline.retrieval.collection.get()
-            if all_data['ids'] and len(all_data['ids']) > 0:
+            # Fetch only the first chunk rather than materializing the whole collection
+            collection = rag_pipeline.retrieval.collection
+            try:
+                first = collection.get(limit=1, include=['documents', 'metadatas'])
+            except TypeError:
+                first = collection.peek(1)
+            if first['ids'] and len(first['ids']) > 0:
                 # Get first chunk as sample
                 sample_chunk = {
-                    'id': all_data['ids'][0],
-                    'content_preview': all_data['documents'][0][:200] if all_data['documents'] else None,
-                    'metadata': all_data['metadatas'][0] if all_data['metadatas'] else None
+                    'id': first['ids'][0],
+                    'content_preview': first['documents'][0][:200] if first['documents'] else None,
+                    'metadata': first['metadatas'][0] if first['metadatas'] else None
                 }
         except Exception as e:
             print(f"[Stats] Error getting sample chunk: {e}")
         
-        # Test retrieval with a simple query
+        # Test retrieval with a simple query (only on request; it embeds a query and searches)
         retrieval_test = None
-        try:
-            test_query = "column names"
-            test_embedding = rag_pipeline.embedding.embed_query(test_query)
-            test_results = rag_pipeline.retrieval.retrieve(test_embedding, n_results=3)
-            retrieval_test = {
-                'query': test_query,
-                'chunks_retrieved': len(test_results),
-                'has_results': len(test_results) > 0
-            }
-        except Exception as e:
-            print(f"[Stats] Error testing retrieval: {e}")
-            retrieval_test = {'error': str(e)}
+        if deep:
+            try:
+                test_query = "column names"
+                test_embedding = rag_pipeline.embedding.embed_query(test_query)
+                test_results = rag_pipeline.retrieval.retrieve(test_embedding, n_results=3)
+                retrieval_test = {
+                    'query': test_query,
+                    'chunks_retrieved': len(test_results),
+                    'has_results': len(test_results) > 0
+                }
+            except Exception as e:
+                print(f"[Stats] Error testing retrieval: {e}")
+                retrieval_test = {'error': str(e)}
         
-        return jsonify({
+        response = jsonify({
             'stats': stats,
             'loaded_files_count': len(loaded_files),
-            'loaded_files': list(loaded_files),
+            'loaded_files': list(islice(loaded_files, MAX_STATS_LOADED_FILES)),
             'sample_chunk': sample_chunk,
             'retrieval_test': retrieval_test
         })
+        if not deep:
+            response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _save_upload_stream(stream, file_path):
+    """
+    Copy an upload stream to file_path in UPLOAD_CHUNK_SIZE chunks, enforcing MAX_FILE_SIZE.
+    
+    The data goes to a temporary file that replaces file_path only once the whole upload
+    has arrived, so a failed or oversized upload never replaces an existing file.
+    Returns the number of bytes saved, or None if the upload exceeded MAX_FILE_SIZE.
+    """
+    tmp_path = f"{file_path}.part"
+    file_size = 0
+    try:
+        with open(tmp_path, 'wb') as out:
+            while True:
+                chunk = stream.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                file_size += len(chunk)
+                if file_size > MAX_FILE_SIZE:
+                    break
+                out.write(chunk)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    
+    if file_size > MAX_FILE_SIZE:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, file_path)
+    return file_size
+
+def _finish_upload(file_path, filename, process_file):
+    """Build the response for a saved upload, ingesting it into the RAG pipeline if requested."""
+    result = {
+        'message': f'File "{filename}" uploaded successfully!',
+        'filename': filename,
+        'file_path': file_path,
+        'processed': False
+    }
+    
+    # Process file if requested
+    if process_file:
+        if not rag_pipeline or not rag_ingestion:
+            initialize_rag_pipeline()
+        
+        try:
+            logger.info(f"Processing uploaded file: {filename}")
+            # Use new ingestion pipeline
+            df = rag_ingestion.read_excel_file(file_path)
+            logger.info(f"Read DataFrame: {len(df)} rows, {len(df.columns)} columns")
+            md_content = rag_ingestion.convert_dataframe_to_markdown(
+                df, metadata={'file_path': file_path, 'source': 'upload'}
+            )
+            chunks = rag_ingestion.chunk_markdown(md_content)
+            logger.info(f"Created {len(chunks)} chunks")
+            file_id = Path(file_path).stem
+            rag_pipeline.ingest_document(chunks, file_id=file_id)
+            _uploaded_file_columns[file_id] = [str(col) for col in df.columns]
+            logger.info(f"Stored {len(chunks)} chunks for {filename}")
+            
+            loaded_files.add(file_path)
+            _file_columns_changed()
+            result['message'] = f'File "{filename}" uploaded and processed successfully!'
+            result['processed'] = True
+            result['chunks_created'] = len(chunks)
+        except Exception as e:
+            logger.error(f"ERROR processing uploaded file: {str(e)}")
+            error_trace = _debug_traceback()
+            return jsonify(_with_traceback({
+                'error': f'Error processing file: {str(e)}'
+            }, error_trace)), 500
+    
+    return jsonify(result)
+
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """Handle file upload."""
@@ -1565,11 +2250,10 @@ def upload_file():
             }), 400
         
         # Validate file extension
-        allowed_extensions = ('.xlsx', '.xls', '.xlsm', '.xlsb', '.csv')
         file_ext = os.path.splitext(file.filename)[1].lower()
-        if file_ext not in allowed_extensions:
+        if file_ext not in UPLOAD_EXTENSIONS:
             return jsonify({
-                'error': f'Invalid file type. Allowed types: {", ".join(allowed_extensions)}'
+                'error': f'Invalid file type. Allowed types: {", ".join(UPLOAD_EXTENSIONS)}'
             }), 400
         
         # Check if processing is requested
@@ -1582,56 +2266,191 @@ def upload_file():
         # Sanitize filename to prevent path traversal
         safe_filename = os.path.basename(file.filename)
         file_path = os.path.join(upload_dir, safe_filename)
-        file.save(file_path)
+        _save_upload_stream(file.stream, file_path)
         
-        result = {
-            'message': f'File "{file.filename}" uploaded successfully!',
-            'filename': file.filename,
-            'file_path': file_path,
-            'processed': False
-        }
+        return _finish_upload(file_path, file.filename, process_file)
         
-        # Process file if requested
-        if process_file:
-            if not rag_pipeline or not rag_ingestion:
-                initialize_rag_pipeline()
-            
-            try:
-                logger.info(f"Processing uploaded file: {file.filename}")
-                # Use new ingestion pipeline
-                df = rag_ingestion.read_excel_file(file_path)
-                logger.info(f"Read DataFrame: {len(df)} rows, {len(df.columns)} columns")
-                md_content = rag_ingestion.convert_dataframe_to_markdown(
-                    df, metadata={'file_path': file_path, 'source': 'upload'}
-                )
-                chunks = rag_ingestion.chunk_markdown(md_content)
-                logger.info(f"Created {len(chunks)} chunks")
-                file_id = Path(file_path).stem
-                rag_pipeline.ingest_document(chunks, file_id=file_id)
-                logger.info(f"Stored {len(chunks)} chunks for {file.filename}")
-                
-                loaded_files.add(file_path)
-                result['message'] = f'File "{file.filename}" uploaded and processed successfully!'
-                result['processed'] = True
-                result['chunks_created'] = len(chunks)
-            except Exception as e:
-                import traceback
-                error_trace = traceback.format_exc()
-                logger.error(f"ERROR processing uploaded file: {str(e)}")
-                logger.debug(f"Traceback: {error_trace}")
-                return jsonify({
-                    'error': f'Error processing file: {str(e)}',
-                    'traceback': error_trace
-                }), 500
+    except Exception as e:
+        logger.error(f"ERROR uploading file: {str(e)}")
+        error_trace = _debug_traceback()
+        return jsonify(_with_traceback({'error': str(e)}, error_trace)), 500
+
+@app.route('/api/upload_stream', methods=['POST'])
+def upload_file_stream():
+    """
+    Handle a file upload sent as the raw request body.
+    
+    The body is the file content itself (application/octet-stream), so it is copied
+    to disk in fixed-size chunks without multipart parsing. The file name is sent
+    URL-encoded in the X-Filename header; pass ?process=false to skip processing.
+    """
+    try:
+        # Sanitize filename to prevent path traversal
+        safe_filename = os.path.basename(unquote(request.headers.get('X-Filename', '')))
+        if not safe_filename:
+            return jsonify({'error': 'No file selected'}), 400
+        
+        # Validate file extension
+        file_ext = os.path.splitext(safe_filename)[1].lower()
+        if file_ext not in UPLOAD_EXTENSIONS:
+            return jsonify({
+                'error': f'Invalid file type. Allowed types: {", ".join(UPLOAD_EXTENSIONS)}'
+            }), 400
+        
+        size_mb = MAX_FILE_SIZE / (1024 * 1024)
+        if request.content_length is not None and request.content_length > MAX_FILE_SIZE:
+            return jsonify({
+                'error': f'File size exceeds maximum allowed size of {size_mb}MB'
+            }), 400
+        
+        # Check if processing is requested
+        process_file = request.args.get('process', 'true').lower() == 'true'
+        
+        upload_dir = os.path.join(os.getcwd(), 'uploads')
+        os.makedirs(upload_dir, exist_ok=True)
+        file_path = os.path.join(upload_dir, safe_filename)
+        
+        if _save_upload_stream(request.stream, file_path) is None:
+            return jsonify({
+                'error': f'File size exceeds maximum allowed size of {size_mb}MB'
+            }), 400
         
-        return jsonify(result)
+        return _finish_upload(file_path, safe_filename, process_file)
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
         logger.error(f"ERROR uploading file: {str(e)}")
-        logger.debug(f"Traceback: {error_trace}")
-        return jsonify({'error': str(e), 'traceback': error_trace}), 500
+        error_trace = _debug_traceback()
+        return jsonify(_with_traceback({'error': str(e)}, error_trace)), 500
+
+# Chunked uploads in progress: {upload_id: {'filename': str, 'total': int, 'ranges': {start: end}}}
+# Bounded so abandoned uploads cannot grow it without limit; the oldest is evicted first.
+MAX_PENDING_UPLOADS = 64
+_pending_uploads = OrderedDict()
+_pending_uploads_lock = threading.Lock()
+UPLOAD_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+CONTENT_RANGE_PATTERN = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+def _partial_upload_path(upload_id):
+    """Path of the temporary file a chunked upload is assembled in."""
+    partial_dir = os.path.join(os.getcwd(), 'uploads', '.partial')
+    os.makedirs(partial_dir, exist_ok=True)
+    return os.path.join(partial_dir, f"{upload_id}.part")
+
+def _ranges_cover(ranges, total):
+    """Check whether the received {start: end} byte ranges cover 0..total-1."""
+    covered = 0
+    for start, end in sorted(ranges.items()):
+        if start > covered:
+            return False
+        covered = max(covered, end + 1)
+    return covered >= total
+
+@app.route('/api/upload_chunk', methods=['GET', 'POST'])
+def upload_chunk():
+    """
+    Handle a resumable upload sent as a series of chunks.
+    
+    POST: the body is one chunk of the file. Headers: X-Upload-Id (client-chosen id,
+    letters/digits/_/-), X-Filename (URL-encoded) and Content-Range
+    ("bytes start-end/total"). Chunks may arrive in any order and may be retried;
+    once every byte has been received the file is moved into the uploads folder
+    and processed like /api/upload (pass ?process=false to skip processing).
+    
+    GET ?upload_id=...: report how many bytes of an upload have been received, so an
+    interrupted client can resume.
+    """
+    try:
+        upload_id = request.headers.get('X-Upload-Id') or request.args.get('upload_id', '')
+        if not UPLOAD_ID_PATTERN.match(upload_id):
+            return jsonify({'error': 'A valid upload id is required'}), 400
+        
+        if request.method == 'GET':
+            with _pending_uploads_lock:
+                state = _pending_uploads.get(upload_id)
+                if state is None:
+                    return jsonify({'upload_id': upload_id, 'received': 0, 'ranges': []})
+                ranges = sorted(state['ranges'].items())
+            return jsonify({
+                'upload_id': upload_id,
+                'received': sum(end - start + 1 for start, end in ranges),
+                'total': state['total'],
+                'ranges': ranges
+            })
+        
+        match = CONTENT_RANGE_PATTERN.match(request.headers.get('Content-Range', ''))
+        if not match:
+            return jsonify({'error': 'Content-Range header must be "bytes start-end/total"'}), 400
+        start, end, total = (int(value) for value in match.groups())
+        if start > end or end >= total:
+            return jsonify({'error': 'Invalid Content-Range'}), 400
+        if total > MAX_FILE_SIZE:
+            size_mb = MAX_FILE_SIZE / (1024 * 1024)
+            return jsonify({
+                'error': f'File size exceeds maximum allowed size of {size_mb}MB'
+            }), 400
+        
+        # Sanitize filename to prevent path traversal
+        safe_filename = os.path.basename(unquote(request.headers.get('X-Filename', '')))
+        if not safe_filename:
+            return jsonify({'error': 'No file selected'}), 400
+        file_ext = os.path.splitext(safe_filename)[1].lower()
+        if file_ext not in UPLOAD_EXTENSIONS:
+            return jsonify({
+                'error': f'Invalid file type. Allowed types: {", ".join(UPLOAD_EXTENSIONS)}'
+            }), 400
+        
+        part_path = _partial_upload_path(upload_id)
+        with _pending_uploads_lock:
+            state = _pending_uploads.get(upload_id)
+            if state is None or state['total'] != total or state['filename'] != safe_filename:
+                state = {'filename': safe_filename, 'total': total, 'ranges': {}}
+                _pending_uploads[upload_id] = state
+                with open(part_path, 'wb') as part:
+                    part.truncate(total)
+            _pending_uploads.move_to_end(upload_id)
+            while len(_pending_uploads) > MAX_PENDING_UPLOADS:
+                evicted_id, _ = _pending_uploads.popitem(last=False)
+                try:
+                    os.remove(_partial_upload_path(evicted_id))
+                except OSError:
+                    pass
+        
+        # Write the chunk at its offset
+        expected = end - start + 1
+        written = 0
+        with open(part_path, 'r+b') as part:
+            part.seek(start)
+            while written < expected:
+                chunk = request.stream.read(min(UPLOAD_CHUNK_SIZE, expected - written))
+                if not chunk:
+                    break
+                part.write(chunk)
+                written += len(chunk)
+        if written != expected:
+            return jsonify({'error': f'Chunk body has {written} bytes, Content-Range expects {expected}'}), 400
+        
+        with _pending_uploads_lock:
+            if _pending_uploads.get(upload_id) is not state:
+                return jsonify({'error': 'Upload was restarted or expired; please retry'}), 409
+            state['ranges'][start] = end
+            received = sum(e - s + 1 for s, e in state['ranges'].items())
+            complete = _ranges_cover(state['ranges'], total)
+            if complete:
+                del _pending_uploads[upload_id]
+        
+        if not complete:
+            return jsonify({'upload_id': upload_id, 'received': received, 'total': total, 'complete': False})
+        
+        upload_dir = os.path.join(os.getcwd(), 'uploads')
+        file_path = os.path.join(upload_dir, safe_filename)
+        os.replace(part_path, file_path)
+        process_file = request.args.get('process', 'true').lower() == 'true'
+        return _finish_upload(file_path, safe_filename, process_file)
+        
+    except Exception as e:
+        logger.error(f"ERROR uploading file chunk: {str(e)}")
+        error_trace = _debug_traceback()
+        return jsonify(_with_traceback({'error': str(e)}, error_trace)), 500
 
 @app.route('/api/uploaded-files', methods=['GET'])
 def list_uploaded_files():
@@ -1641,21 +2460,30 @@ def list_uploaded_files():
         if not os.path.exists(upload_dir):
             return jsonify({'files': []})
         
+        # Uploads are renamed into place, so adding, replacing or removing a file always
+        # updates the directory's mtime; use it to answer repeat polls with 304 Not Modified
+        etag = str(os.stat(upload_dir).st_mtime_ns)
+        if request.if_none_match.contains_weak(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag, weak=True)
+            return response
+        
         files = []
-        for filename in os.listdir(upload_dir):
-            file_path = os.path.join(upload_dir, filename)
-            if os.path.isfile(file_path):
-                # Check if it's a supported file type
-                if filename.lower().endswith(('.xlsx', '.xls', '.csv', '.xlsm', '.xlsb')):
-                    file_stat = os.stat(file_path)
+        # Check the extension first, then reuse the directory entry's file type and stat
+        with os.scandir(upload_dir) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(UPLOAD_EXTENSIONS) and entry.is_file():
+                    file_stat = entry.stat()
                     files.append({
-                        'filename': filename,
-                        'path': file_path,
+                        'filename': entry.name,
+                        'path': entry.path,
                         'size': file_stat.st_size,
                         'modified': datetime.fromtimestamp(file_stat.st_mtime).isoformat()
                     })
         
-        return jsonify({'files': files})
+        response = jsonify({'files': files})
+        response.set_etag(etag, weak=True)
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -1668,41 +2496,28 @@ def settings_endpoint():
         data = request.json
         settings.update(data)
         
-        # Save settings to file
-        try:
-            settings_file = "app_settings.json"
-            with open(settings_file, 'w', encoding='utf-8') as f:
-                json.dump(settings, f, indent=2)
-            logger.info(f"Saved settings to {settings_file}")
-        except Exception as e:
-            logger.warning(f"Error saving settings to file: {e}")
+        # Save settings to file (in the background, coalesced with any further updates)
+        _schedule_save('settings', save_settings_to_file)
         
         return jsonify({'message': 'Settings updated', 'settings': settings})
 
 @app.route('/api/training', methods=['GET', 'POST', 'DELETE'])
 def training_endpoint():
     """Manage training data - get all, add new, or delete."""
-    global training_data
+    global training_data, _user_training_data_cache
     
     if request.method == 'GET':
         # Filter out FAQ training data - only return user-added training data
-        # Get all FAQ questions
-        faq_questions = set()
-        if 'basic' in FAQS:
-            faq_questions.update(FAQS['basic'])
-        if 'intermediate' in FAQS:
-            faq_questions.update(FAQS['intermediate'])
-        if 'advanced' in FAQS:
-            faq_questions.update(FAQS['advanced'])
-        if 'operational' in FAQS:
-            faq_questions.update(FAQS['operational'])
-        
-        # Filter training data to exclude FAQ questions
-        user_training_data = {
-            question: answer 
-            for question, answer in training_data.items() 
-            if question not in faq_questions
-        }
+        # (rebuilt only after training_data changes)
+        version = _training_data_version
+        if _user_training_data_cache is None or _user_training_data_cache[0] != version:
+            # Filter training data to exclude FAQ questions
+            _user_training_data_cache = (version, {
+                question: answer 
+                for question, answer in training_data.items() 
+                if question not in FAQ_QUESTIONS
+            })
+        user_training_data = _user_training_data_cache[1]
         
         return jsonify({
             'training_data': user_training_data,
@@ -1725,16 +2540,14 @@ def training_endpoint():
         # Save training data
         training_data[question] = answer
         
-        # Save to file
-        if save_training_data():
-            return jsonify({
-                'message': 'Training data saved successfully',
-                'question': question,
-                'answer': answer,
-                'total_training_entries': len(training_data)
-            })
-        else:
-            return jsonify({'error': 'Failed to save training data'}), 500
+        # Save to file (coalesced with other pending changes)
+        mark_training_dirty()
+        return jsonify({
+            'message': 'Training data saved successfully',
+            'question': question,
+            'answer': answer,
+            'total_training_entries': len(training_data)
+        })
     
     elif request.method == 'DELETE':
         # Delete training data
@@ -1746,7 +2559,7 @@ def training_endpoint():
         
         if question in training_data:
             del training_data[question]
-            save_training_data()
+            mark_training_dirty()
             return jsonify({
                 'message': 'Training data deleted successfully',
                 'total_training_entries': len(training_data)
@@ -1754,6 +2567,26 @@ def training_endpoint():
         else:
             return jsonify({'error': 'Question not found in training data'}), 404
 
+def _dataframe_to_markdown_table(df):
+    """
+    Render a DataFrame as a Markdown pipe table.
+    
+    Rows are assembled with vectorized string operations, one column at a time, rather than
+    formatting each cell in Python. Missing values are left blank.
+    """
+    header = "| " + " | ".join(str(col) for col in df.columns) + " |"
+    separator = "| " + " | ".join("---" for _ in df.columns) + " |"
+    if df.empty:
+        return f"{header}\n{separator}"
+    
+    rows = None
+    for col_idx in range(df.shape[1]):
+        column = df.iloc[:, col_idx]
+        values = column.astype(str).where(column.notna(), '')
+        values = values.str.replace('|', '\\|', regex=False).str.replace('\n', ' ', regex=False)
+        rows = values if rows is None else rows + " | " + values
+    return "\n".join([header, separator] + ("| " + rows + " |").tolist())
+
 @app.route('/api/training/upload', methods=['POST'])
 def training_upload():
     """Upload Excel/CSV file for training answer."""
@@ -1775,22 +2608,40 @@ def training_upload():
         os.makedirs(upload_dir, exist_ok=True)
         filename = f"training_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{file.filename}"
         file_path = os.path.join(upload_dir, filename)
-        file.save(file_path)
+        if _save_upload_stream(file.stream, file_path) is None:
+            size_mb = MAX_FILE_SIZE / (1024 * 1024)
+            return jsonify({
+                'error': f'File size exceeds maximum allowed size of {size_mb}MB'
+            }), 400
         
         # Read the file and convert to markdown
         try:
-            df = pd.read_excel(file_path) if file_path.endswith(('.xlsx', '.xls', '.xlsm', '.xlsb')) else pd.read_csv(file_path)
+            import pandas as pd
+            # Only the first sheet and the first MAX_TRAINING_ROWS rows are used
+            if file_path.lower().endswith(('.xlsx', '.xls', '.xlsm', '.xlsb')):
+                df = None
+                if CALAMINE_AVAILABLE:
+                    try:
+                        df = pd.read_excel(file_path, sheet_name=0, nrows=MAX_TRAINING_ROWS, engine='calamine')
+                    except Exception as e:
+                        logger.warning(f"Error reading {filename} with calamine, falling back: {e}")
+                if df is None:
+                    df = pd.read_excel(file_path, sheet_name=0, nrows=MAX_TRAINING_ROWS)
+            else:
+                df = pd.read_csv(file_path, nrows=MAX_TRAINING_ROWS, low_memory=False)
+            if len(df) >= MAX_TRAINING_ROWS:
+                logger.info(f"Training upload {filename} truncated to {MAX_TRAINING_ROWS} rows")
             
             # Convert DataFrame to markdown format
             if rag_system:
                 answer = rag_system.convert_to_markdown(df, metadata={'source': 'training_upload', 'question': question})
             else:
                 # Fallback: simple conversion
-                answer = f"## Training Data Answer\n\n{df.to_markdown(index=False)}"
+                answer = f"## Training Data Answer\n\n{_dataframe_to_markdown_table(df)}"
             
             # Save as training data
             training_data[question] = answer
-            save_training_data()
+            mark_training_dirty()
             
             # Clean up temp file
             try:
@@ -1841,16 +2692,14 @@ def edited_answers_endpoint():
         # Save edited answer
         edited_answers[question] = answer
         
-        # Save to file
-        if save_edited_answers():
-            return jsonify({
-                'message': 'Edited answer saved permanently successfully',
-                'question': question,
-                'answer': answer,
-                'total_edited_entries': len(edited_answers)
-            })
-        else:
-            return jsonify({'error': 'Failed to save edited answer'}), 500
+        # Save to file (coalesced with other pending changes)
+        mark_edited_dirty()
+        return jsonify({
+            'message': 'Edited answer saved permanently successfully',
+            'question': question,
+            'answer': answer,
+            'total_edited_entries': len(edited_answers)
+        })
     
     elif request.method == 'DELETE':
         # Delete edited answer
@@ -1862,7 +2711,7 @@ def edited_answers_endpoint():
         
         if question in edited_answers:
             del edited_answers[question]
-            save_edited_answers()
+            mark_edited_dirty()
             return jsonify({
                 'message': 'Edited answer deleted successfully',
                 'total_edited_entries': len(edited_answers)
@@ -1890,20 +2739,35 @@ def download_answer():
         # Use custom filename if provided, otherwise generate one
         if custom_filename:
             # Sanitize filename
-            custom_filename = re.sub(r'[<>:"/\\|?*]', '_', custom_filename)
+            custom_filename = custom_filename[:MAX_DOWNLOAD_FILENAME_LENGTH].translate(FILENAME_SANITIZE_TABLE)
             filename = f"{custom_filename}.txt"
         else:
             filename = f"query_answer_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         
         file_path = os.path.join(download_dir, filename)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(f"Query: {query}\n")
-            f.write(f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            if numeric_value is not None:
-                f.write(f"Numeric Value: {numeric_value}\n")
-            f.write("-" * 80 + "\n\n")
-            f.write(answer)
+        parts = [
+            f"Query: {query}\n",
+            f"Date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        ]
+        if numeric_value is not None:
+            parts.append(f"Numeric Value: {numeric_value}\n")
+        parts.append("-" * 80 + "\n\n")
+        parts.append(answer)
+        
+        # Write to a temporary file and rename it into place, so a partially written
+        # download is never visible under the final name
+        tmp_path = f"{file_path}.part"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', buffering=JSON_IO_BUFFER_SIZE) as f:
+                f.write(''.join(parts))
+            os.replace(tmp_path, file_path)
+        except Exception:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
         
         return jsonify({
             'message': 'Answer downloaded successfully',
@@ -1914,6 +2778,11 @@ def download_answer():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _no_cache(response):
+    """Make browsers revalidate a page on every load (answered with 304 when unchanged)."""
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @app.route('/')
 def index():
     """Demo page for the chatbot."""
@@ -1922,12 +2791,12 @@ def index():
 @app.route('/test')
 def test_page():
     """Local test page for the chatbot."""
-    return send_from_directory('.', 'test_chatbot_local.html')
+    return _no_cache(send_from_directory('.', 'test_chatbot_local.html', max_age=0))
 
 @app.route('/test-simple')
 def test_simple():
     """Simple test page."""
-    return send_from_directory('.', 'test_simple.html')
+    return _no_cache(send_from_directory('.', 'test_simple.html', max_age=0))
 
 @app.route('/static/<path:filename>')
 def serve_static(filename):
@@ -1941,5 +2810,19 @@ if __name__ == '__main__':
     port = int(os.getenv('FLASK_PORT', '5000'))
     host = os.getenv('FLASK_HOST', '0.0.0.0')
     
-    app.run(debug=debug_mode, host=host, port=port)
+    # Loaded data, caches and pending uploads live in this process, so scale with threads
+    # in one process rather than with multiple worker processes
+    threads = int(os.getenv('SERVER_THREADS', '8'))
+    waitress = None
+    if not debug_mode:
+        try:
+            import waitress
+        except ImportError:
+            logger.info("waitress not installed, using the Flask development server")
+    
+    if waitress is not None:
+        logger.info(f"Serving with waitress on {host}:{port} ({threads} threads)")
+        waitress.serve(app, host=host, port=port, threads=threads)
+    else:
+        app.run(debug=debug_mode, host=host, port=port, threaded=True)
 
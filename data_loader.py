@@ -11,13 +11,371 @@ Design Philosophy:
 - Accuracy bounded by data correctness
 """
 
+import codecs
+import hashlib
+import importlib.util
+import logging
+import os
+import shutil
+import numpy as np
 import pandas as pd
 import sqlite3
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Tuple
 import json
+import threading
+from collections import Counter
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+# PyArrow's CSV reader tokenizes and converts in parallel; fall back to pandas' C parser
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# python-calamine reads every Excel format (pandas engine='calamine'), much faster than openpyxl/xlrd
+CALAMINE_AVAILABLE = importlib.util.find_spec('python_calamine') is not None
+
+# Strings pandas' read_csv treats as missing by default (passed to PyArrow so both agree)
+CSV_NA_VALUES = [
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+    '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null'
+]
+# pandas Excel engine for each format when python-calamine is not installed (or fails)
+EXCEL_ENGINES = {'.xls': 'xlrd', '.xlsx': 'openpyxl', '.xlsm': 'openpyxl', '.xlsb': 'pyxlsb'}
+# Block size PyArrow splits a CSV into for parallel parsing
+CSV_BLOCK_SIZE = 8 * 1024 * 1024
+# Source files at least this large keep a Parquet copy of their parsed DataFrame
+FRAME_CACHE_MIN_SIZE = 50 * 1024 * 1024
+# Directory (next to the data cache database) holding the Parquet copies
+FRAME_CACHE_DIR = "frame_cache"
+# Part of every cache key; bump it when loading or cleaning changes so old copies are not reused
+FRAME_CACHE_VERSION = 1
+# Leading rows searched for a column's sample values before scanning the whole column
+SCHEMA_SAMPLE_SCAN_ROWS = 20
+# CSV files at least this large are memory-mapped for the pandas reader, so encoding
+# retries re-parse the mapped pages instead of reading the file again
+CSV_MEMORY_MAP_THRESHOLD = 32 * 1024 * 1024
+
+
+def _now_iso() -> str:
+    """Current local time as an ISO 8601 string (schema 'loaded_at' stamps)."""
+    return datetime.now().isoformat()
+
+
+def _missing_strings_as_nan(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replace None with NaN in object columns of a DataFrame built from Arrow data.
+    
+    Arrow marks missing strings as None when converting to object columns; pandas' own
+    readers use NaN.
+    """
+    for col in df.columns[df.dtypes == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+
+def _read_csv_arrow(file_path: str) -> Optional[pd.DataFrame]:
+    """
+    Read a UTF-8 CSV file with PyArrow's multithreaded reader.
+    
+    Returns None when PyArrow is unavailable, cannot parse the file (e.g. it is not UTF-8 or
+    has ragged rows), or would infer a different table than pandas: duplicate or blank
+    headers (pandas renames them), integers too large for int64 (pandas reads them as
+    uint64 or text), booleans with gaps and header-only files. The caller then reads the
+    file with pandas instead.
+    """
+    if not PYARROW_AVAILABLE:
+        return None
+    
+    def read(column_types=None):
+        return pa_csv.read_csv(
+            file_path,
+            read_options=pa_csv.ReadOptions(use_threads=True, block_size=CSV_BLOCK_SIZE),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                null_values=CSV_NA_VALUES,
+                strings_can_be_null=True,
+                true_values=['True', 'TRUE', 'true'],
+                false_values=['False', 'FALSE', 'false']
+            )
+        )
+    
+    try:
+        table = read()
+        # pandas keeps dates and times as text; read those columns again as strings
+        temporal = {field.name: pa.string() for field in table.schema if pa.types.is_temporal(field.type)}
+        if temporal:
+            table = read(temporal)
+    except (pa.ArrowInvalid, UnicodeDecodeError):
+        return None
+    if table.num_rows == 0:
+        return None
+    
+    names = table.column_names
+    if len(set(names)) != len(names) or '' in names:
+        return None
+    for index, (field, column) in enumerate(zip(table.schema, table.columns)):
+        if pa.types.is_null(field.type):
+            # All-missing columns: pandas reads these as float64 NaN
+            table = table.set_column(index, field.name, column.cast(pa.float64()))
+        elif pa.types.is_binary(field.type) or pa.types.is_large_binary(field.type):
+            # Text that is not valid UTF-8; pandas decodes it with a fallback encoding
+            return None
+        elif pa.types.is_boolean(field.type) and column.null_count:
+            # pandas fills missing booleans with NaN rather than None
+            return None
+        elif pa.types.is_floating(field.type):
+            # Integers beyond int64 are inferred as double by PyArrow
+            if pc.any(pc.and_(pc.greater_equal(pc.abs(column), 2.0 ** 63),
+                              pc.equal(pc.floor(column), column))).as_py():
+                return None
+        elif pa.types.is_string(field.type):
+            # pandas keeps missing-value markers as text in columns holding such integers
+            if pc.any(pc.match_substring_regex(column, r'^\s*[+-]?\d{19,}\s*$')).as_py():
+                return None
+    return _missing_strings_as_nan(table.to_pandas())
+
+
+def _is_utf8(file_path: str) -> bool:
+    """
+    Whether a whole file decodes as UTF-8.
+    
+    A block-wise decode is far cheaper than a pandas parse that fails on the last line, so
+    the CSV reader uses it to skip a doomed UTF-8 attempt on Latin-1/cp1252 files.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(CSV_BLOCK_SIZE), b''):
+                decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def _drop_empty_rows_and_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drop all-missing rows and columns and reset the index, from a single isna() pass.
+    
+    Equivalent to df.dropna(how='all').dropna(axis=1, how='all').reset_index(drop=True):
+    a column with a value in some row keeps that row, so both masks can come from the
+    same scan.
+    """
+    na = df.isna().to_numpy()
+    if na.size and not na.any():
+        return _with_default_index(df)
+    keep_rows = ~na.all(axis=1)
+    keep_columns = ~na.all(axis=0)
+    if not keep_rows.all() or not keep_columns.all():
+        # The selection is already a new frame; relabel its rows instead of copying it again
+        df = df.iloc[keep_rows, keep_columns]
+        df.index = pd.RangeIndex(len(df))
+        return df
+    return _with_default_index(df)
+
+
+def _with_default_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    df.reset_index(drop=True), returning df itself when its index is already 0..n-1.
+    
+    Without copy-on-write (pandas 2), reset_index copies every column.
+    """
+    index = df.index
+    if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1:
+        return df
+    return df.reset_index(drop=True)
+
+
+def _downcast_integer_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Store int64 columns in the smallest integer type that holds all their values.
+    
+    Only a storage saving: sums, means and group-by aggregates still accumulate in 64 bits,
+    but element-wise arithmetic between columns wraps at the narrow type (cast to int64
+    first). Schemas and the data-types query report logical_dtype_name(), not the storage
+    type. Float and text columns are left alone (float32 rounds values; categoricals change
+    dtype checks).
+    """
+    if not df.columns.is_unique:
+        return df
+    downcast = {}
+    for col in df.columns[df.dtypes == np.int64]:
+        series = pd.to_numeric(df[col], downcast='integer')
+        if series.dtype != np.int64:
+            downcast[col] = series
+    return df.assign(**downcast) if downcast else df
+
+
+def logical_dtype_name(dtype) -> str:
+    """Name of a column's type as loaded, reporting downcast integer columns as int64."""
+    if pd.api.types.is_signed_integer_dtype(dtype) and not pd.api.types.is_extension_array_dtype(dtype):
+        return 'int64'
+    return str(dtype)
+
+
+def _file_signature(file_path) -> Optional[Tuple[int, int]]:
+    """(mtime_ns, size) of a file, or None if it cannot be read."""
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _csv_dtype_hints(data_types: Dict[str, str]) -> Dict[str, str]:
+    """
+    dtype= hints for pd.read_csv from the data_types of a previously registered schema.
+    
+    Only numeric and boolean columns are hinted. Integers are read as 64-bit: the registered
+    type may have been downcast, and read_csv silently wraps values that overflow it.
+    """
+    hints = {}
+    for col, dtype_name in data_types.items():
+        try:
+            dtype = pd.api.types.pandas_dtype(dtype_name)
+        except TypeError:
+            continue
+        if pd.api.types.is_bool_dtype(dtype):
+            hints[col] = 'bool'
+        elif pd.api.types.is_signed_integer_dtype(dtype):
+            hints[col] = 'int64'
+        elif pd.api.types.is_unsigned_integer_dtype(dtype):
+            hints[col] = 'uint64'
+        elif pd.api.types.is_float_dtype(dtype):
+            hints[col] = 'float64'
+    return hints
+
+
+def _frame_cacheable(df: pd.DataFrame) -> bool:
+    """Whether a DataFrame survives a Parquet round trip unchanged (names and dtypes)."""
+    for col, dtype in df.dtypes.items():
+        if not isinstance(col, str):
+            return False
+        if (pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype)
+                or pd.api.types.is_datetime64_any_dtype(dtype)):
+            continue
+        if dtype == object:
+            # Object columns round-trip only if they hold nothing but strings
+            if pd.api.types.infer_dtype(df[col], skipna=True) not in ('string', 'empty'):
+                return False
+        elif not pd.api.types.is_string_dtype(dtype):
+            return False
+    return True
+
+
+def _read_cached_frame(cache_path: Path) -> Optional[pd.DataFrame]:
+    """Read a DataFrame from its Parquet cache file, or None if there is no usable copy."""
+    if not cache_path.exists():
+        return None
+    try:
+        df = pd.read_parquet(cache_path, engine='pyarrow')
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable frame cache {cache_path}: {e}")
+        return None
+    return _missing_strings_as_nan(df)
+
+
+def _write_cached_frame(df: pd.DataFrame, cache_path: Path):
+    """Write a DataFrame to its Parquet cache file (skipped if it would not round-trip)."""
+    if not _frame_cacheable(df):
+        return
+    tmp_path = cache_path.with_suffix('.tmp')
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_parquet(tmp_path, engine='pyarrow', compression='snappy', index=False)
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        logger.warning(f"Could not write frame cache {cache_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    # Older copies of the same source file (edited since, or an earlier FRAME_CACHE_VERSION)
+    path_key = cache_path.name.split('-', 1)[0]
+    _remove_cached_frames(cache_path.parent, path_key, keep=cache_path)
+
+
+def _frame_cache_path_key(file_path_obj: Path) -> str:
+    """Cache file name prefix shared by every cached copy of one source file (its resolved path)."""
+    return hashlib.sha1(str(file_path_obj.resolve()).encode('utf-8')).hexdigest()[:16]
+
+
+def _remove_cached_frames(cache_dir: Path, path_key: str, keep: Optional[Path] = None):
+    """Delete the cached copies of one source file, except keep."""
+    for stale_path in cache_dir.glob(f"{path_key}-*.parquet"):
+        if stale_path != keep:
+            try:
+                stale_path.unlink()
+            except OSError as e:
+                logger.warning(f"Could not remove frame cache {stale_path}: {e}")
+
+
+class _LazySchema(dict):
+    """
+    Schema dict whose 'columns' and 'sample_values' entries are computed on first access.
+    
+    stats_func returns the (columns, sample_values) pair; it runs at most once.
+    """
+    
+    _LAZY_KEYS = ('columns', 'sample_values')
+    
+    def __init__(self, data: Dict[str, Any], stats_func):
+        super().__init__(data)
+        self._stats_func = stats_func
+        self._lock = threading.Lock()
+    
+    def _materialize(self):
+        with self._lock:
+            if self._stats_func is not None:
+                columns, sample_values = self._stats_func()
+                dict.__setitem__(self, 'columns', columns)
+                dict.__setitem__(self, 'sample_values', sample_values)
+                self._stats_func = None
+    
+    def __getitem__(self, key):
+        if key in self._LAZY_KEYS and self._stats_func is not None:
+            self._materialize()
+        return dict.__getitem__(self, key)
+    
+    def __contains__(self, key):
+        return key in self._LAZY_KEYS or dict.__contains__(self, key)
+    
+    def get(self, key, default=None):
+        if key in self._LAZY_KEYS and self._stats_func is not None:
+            self._materialize()
+        return dict.get(self, key, default)
+    
+    def keys(self):
+        self._materialize()
+        return dict.keys(self)
+    
+    def values(self):
+        self._materialize()
+        return dict.values(self)
+    
+    def items(self):
+        self._materialize()
+        return dict.items(self)
+    
+    def __iter__(self):
+        self._materialize()
+        return dict.__iter__(self)
+    
+    def __len__(self):
+        return dict.__len__(self) + (len(self._LAZY_KEYS) if self._stats_func is not None else 0)
+    
+    def copy(self):
+        self._materialize()
+        return dict(self)
+
 
 class DataLoader:
     """Loads and manages structured data files."""
@@ -31,26 +389,88 @@ class DataLoader:
         """
         self.dataframes: Dict[str, pd.DataFrame] = {}  # {file_id: DataFrame}
         self.schemas: Dict[str, Dict[str, Any]] = {}  # {file_id: schema_info}
+        # Column names across all files, counted per file so unloading one file is O(columns)
+        self._column_counts: Counter = Counter()
+        self._sorted_columns: Optional[List[str]] = None
+        self._columns_lock = threading.Lock()
         self.db_path = db_path or "./data_cache.db"
         self._init_database()
     
     def _init_database(self):
-        """Initialize SQLite database for data persistence."""
+        """
+        Initialize the SQLite schema store.
+        
+        It keeps each loaded file's path, (mtime_ns, size) and column types, so a reload of an
+        unchanged file after a restart can skip type inference like an in-process reload.
+        """
         try:
             conn = sqlite3.connect(self.db_path)
-            conn.close()
+            try:
+                with conn:
+                    conn.execute(
+                        "CREATE TABLE IF NOT EXISTS schemas ("
+                        "file_id TEXT PRIMARY KEY, file_path TEXT NOT NULL, "
+                        "mtime_ns INTEGER, size INTEGER, data_types TEXT NOT NULL)"
+                    )
+            finally:
+                conn.close()
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
             logger.warning(f"Could not initialize database: {e}")
     
-    def load_file(self, file_path: str, file_id: Optional[str] = None) -> Tuple[str, pd.DataFrame]:
+    def _execute_store(self, sql: str, params: tuple = (), many: bool = False) -> List[tuple]:
+        """Run one statement (or one per params entry if many) against the schema store in one transaction."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                if many:
+                    conn.executemany(sql, params)
+                    return []
+                return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    
+    def _save_stored_schemas(self, schemas: List[Dict[str, Any]]):
+        """Record registered schemas' file signatures and column types in the schema store."""
+        rows = []
+        for schema in schemas:
+            mtime_ns, size = schema['file_signature'] or (None, None)
+            rows.append((schema['file_id'], schema['file_path'], mtime_ns, size,
+                         json.dumps({str(col): dtype for col, dtype in schema['data_types'].items()})))
+        try:
+            self._execute_store("INSERT OR REPLACE INTO schemas VALUES (?, ?, ?, ?, ?)", rows, many=True)
+        except Exception as e:
+            logger.warning(f"Could not save schemas for {', '.join(row[0] for row in rows)}: {e}")
+    
+    def _get_stored_schema(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """Schema store entry for file_id (file_path, file_signature, data_types), or None."""
+        try:
+            rows = self._execute_store(
+                "SELECT file_path, mtime_ns, size, data_types FROM schemas WHERE file_id = ?",
+                (file_id,)
+            )
+        except Exception as e:
+            logger.warning(f"Could not read stored schema for {file_id}: {e}")
+            return None
+        if not rows:
+            return None
+        file_path, mtime_ns, size, data_types = rows[0]
+        return {
+            'file_path': file_path,
+            'file_signature': (mtime_ns, size) if mtime_ns is not None else None,
+            'data_types': json.loads(data_types)
+        }
+    
+    def load_file(self, file_path: str, file_id: Optional[str] = None,
+                  max_rows: Optional[int] = None,
+                  columns: Optional[List[str]] = None) -> Tuple[str, pd.DataFrame]:
         """
         Load a CSV or Excel file into a DataFrame.
         
         Args:
             file_path: Path to the file
             file_id: Optional identifier for the file
+            max_rows: Optional limit on data rows read; parsing stops once it is reached
+            columns: Optional list of columns to read (all columns if None)
             
         Returns:
             Tuple of (file_id, DataFrame)
@@ -64,61 +484,121 @@ class DataLoader:
         
         file_ext = file_path_obj.suffix.lower()
         
+        # Reloading an unchanged CSV reuses its registered column types instead of inferring them
+        dtype_hints = None
+        known = self.schemas.get(file_id) or self._get_stored_schema(file_id)
+        if (known and file_ext == '.csv' and known['file_path'] == str(file_path)
+                and known.get('file_signature') == _file_signature(file_path_obj)):
+            dtype_hints = _csv_dtype_hints(known['data_types'])
+        
+        # Large files are cached as Parquet after the first parse (keyed by path, mtime and size)
+        partial = max_rows is not None or columns is not None
+        cache_path = self._frame_cache_path(file_path_obj) if not partial else None
+        df = _read_cached_frame(cache_path) if cache_path else None
+        if df is None:
+            try:
+                df = self._read_source(file_path_obj, file_ext, max_rows, columns, dtype_hints)
+            except (ValueError, TypeError, OverflowError):
+                if not dtype_hints:
+                    raise
+                # The earlier load saw only part of the file (e.g. max_rows); infer types afresh
+                df = self._read_source(file_path_obj, file_ext, max_rows, columns)
+            
+            # Clean DataFrame
+            df = _drop_empty_rows_and_columns(df)
+            df = _downcast_integer_columns(df)
+            if cache_path:
+                _write_cached_frame(df, cache_path)
+        
+        # Store DataFrame
+        self._store_dataframe(file_id, df)
+        
+        # Register schema
+        self._register_schema(file_id, df, file_path)
+        
+        logger.info(f"Loaded file: {file_id} ({len(df)} rows, {len(df.columns)} columns)")
+        return file_id, df
+    
+    def _read_source(self, file_path_obj: Path, file_ext: str, max_rows: Optional[int],
+                     columns: Optional[List[str]] = None,
+                     dtype_hints: Optional[Dict[str, str]] = None) -> pd.DataFrame:
+        """Parse a CSV or Excel file into a DataFrame (before cleaning)."""
+        file_path = str(file_path_obj)
+        
         # Load data based on file type
         if file_ext == '.csv':
-            # Try different encodings
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-            df = None
-            last_error = None
-            
-            for encoding in encodings:
-                try:
-                    df = pd.read_csv(file_path, encoding=encoding, low_memory=False)
-                    break
-                except UnicodeDecodeError as e:
-                    last_error = e
-                    continue
-                except Exception as e:
-                    last_error = e
-                    # For non-encoding errors, don't try other encodings
-                    raise
+            # Fast path: PyArrow's parallel reader (UTF-8 files pandas would read the same way).
+            # It always parses the whole file, so row- or column-limited reads go straight to pandas.
+            df = _read_csv_arrow(file_path) if max_rows is None and columns is None else None
             
-            if df is None:
-                # Last resort: try with errors='ignore'
-                try:
-                    df = pd.read_csv(file_path, encoding='utf-8', errors='ignore', low_memory=False)
-                except Exception as e:
-                    error_msg = f"Failed to read CSV file. Tried encodings: {', '.join(encodings)}"
-                    if last_error:
-                        error_msg += f" Last error: {str(last_error)}"
-                    raise ValueError(error_msg) from e
+            if df is not None:
+                logger.debug(f"Read {file_path_obj.name} with the PyArrow CSV reader")
+            else:
+                # Try different encodings (a full read that is not UTF-8 would fail as UTF-8 anyway;
+                # a row-limited one may stop before the bad bytes)
+                encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+                if max_rows is None and not _is_utf8(file_path):
+                    encodings.remove('utf-8')
+                last_error = None
+                memory_map = file_path_obj.stat().st_size >= CSV_MEMORY_MAP_THRESHOLD
+                
+                for encoding in encodings:
+                    try:
+                        df = pd.read_csv(file_path, encoding=encoding, low_memory=False, nrows=max_rows,
+                                         usecols=columns, dtype=dtype_hints, memory_map=memory_map)
+                        logger.debug(f"Read {file_path_obj.name} with pandas' C parser ({encoding})")
+                        break
+                    except UnicodeDecodeError as e:
+                        last_error = e
+                        continue
+                    except Exception as e:
+                        last_error = e
+                        # For non-encoding errors, don't try other encodings
+                        raise
+                
+                if df is None:
+                    # Last resort: drop undecodable bytes
+                    try:
+                        df = pd.read_csv(file_path, encoding='utf-8', encoding_errors='ignore', low_memory=False, nrows=max_rows,
+                                         usecols=columns, dtype=dtype_hints)
+                    except Exception as e:
+                        error_msg = f"Failed to read CSV file. Tried encodings: {', '.join(encodings)}"
+                        if last_error:
+                            error_msg += f" Last error: {str(last_error)}"
+                        raise ValueError(error_msg) from e
         elif file_ext in ['.xlsx', '.xls', '.xlsm', '.xlsb']:
-            engine = 'xlrd' if file_ext == '.xls' else 'openpyxl'
+            engine = 'calamine' if CALAMINE_AVAILABLE else EXCEL_ENGINES[file_ext]
             try:
-                # For large files, use optimized loading
-                df = pd.read_excel(file_path, engine=engine, low_memory=False)
+                df = pd.read_excel(file_path, engine=engine, nrows=max_rows, usecols=columns)
             except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
                 logger.warning(f"Error loading Excel file with engine {engine}: {e}")
-                # Fallback: try without engine specification
-                df = pd.read_excel(file_path)
+                # Fallback: the format's own engine after calamine, else pandas' default choice
+                fallback = EXCEL_ENGINES[file_ext] if engine == 'calamine' else None
+                df = pd.read_excel(file_path, engine=fallback, nrows=max_rows, usecols=columns)
         else:
             raise ValueError(f"Unsupported file format: {file_ext}")
         
-        # Clean DataFrame
-        df = df.dropna(how='all').dropna(axis=1, how='all').reset_index(drop=True)
-        
-        # Store DataFrame
-        self.dataframes[file_id] = df
-        
-        # Register schema
-        self._register_schema(file_id, df, file_path)
+        return df
+    
+    def _frame_cache_path(self, file_path_obj: Path) -> Optional[Path]:
+        """
+        Parquet cache file for a source file, or None if it should not be cached.
         
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Loaded file: {file_id} ({len(df)} rows, {len(df.columns)} columns)")
-        return file_id, df
+        Only files of at least FRAME_CACHE_MIN_SIZE are cached, and only with PyArrow installed.
+        The name is '<resolved path key>-<version, mtime and size key>.parquet': an edited file
+        gets a new entry, and writing it removes the file's older ones.
+        """
+        if not PYARROW_AVAILABLE:
+            return None
+        st = file_path_obj.stat()
+        if st.st_size < FRAME_CACHE_MIN_SIZE:
+            return None
+        key = hashlib.sha1(f"{FRAME_CACHE_VERSION}:{st.st_mtime_ns}:{st.st_size}".encode('utf-8')).hexdigest()[:16]
+        return self._frame_cache_dir() / f"{_frame_cache_path_key(file_path_obj)}-{key}.parquet"
+    
+    def _frame_cache_dir(self) -> Path:
+        """Directory of the Parquet frame cache (next to the data cache database)."""
+        return Path(self.db_path).parent / FRAME_CACHE_DIR
     
     def load_all_sheets(self, file_path: str, base_file_id: Optional[str] = None) -> Dict[str, pd.DataFrame]:
         """
@@ -139,67 +619,127 @@ class DataLoader:
         if file_ext not in ['.xlsx', '.xls', '.xlsm', '.xlsb']:
             raise ValueError(f"Cannot load multiple sheets from {file_ext} file")
         
-        engine = 'xlrd' if file_ext == '.xls' else 'openpyxl'
-        excel_file = pd.ExcelFile(file_path, engine=engine)
+        excel_file = None
+        if CALAMINE_AVAILABLE:
+            try:
+                excel_file = pd.ExcelFile(file_path, engine='calamine')
+            except Exception as e:
+                logger.warning(f"Error opening Excel file with engine calamine: {e}")
+        if excel_file is None:
+            excel_file = pd.ExcelFile(file_path, engine=EXCEL_ENGINES[file_ext])
         
+        # One timestamp for every sheet of the workbook, and one schema store transaction
+        loaded_at = _now_iso()
         sheets_dict = {}
-        for sheet_name in excel_file.sheet_names:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            df = df.dropna(how='all').dropna(axis=1, how='all').reset_index(drop=True)
-            
-            file_id = f"{base_file_id}_{sheet_name}"
-            self.dataframes[file_id] = df
-            self._register_schema(file_id, df, file_path, sheet_name=sheet_name)
-            sheets_dict[sheet_name] = df
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.info(f"Loaded sheet: {file_id} ({len(df)} rows, {len(df.columns)} columns)")
+        schemas = []
+        with excel_file:
+            for sheet_name in excel_file.sheet_names:
+                df = pd.read_excel(excel_file, sheet_name=sheet_name)
+                df = _drop_empty_rows_and_columns(df)
+                df = _downcast_integer_columns(df)
+                
+                file_id = f"{base_file_id}_{sheet_name}"
+                self._store_dataframe(file_id, df)
+                schemas.append(self._register_schema(file_id, df, file_path, sheet_name=sheet_name,
+                                                     loaded_at=loaded_at, save=False))
+                sheets_dict[sheet_name] = df
+                logger.info(f"Loaded sheet: {file_id} ({len(df)} rows, {len(df.columns)} columns)")
         
+        if schemas:
+            self._save_stored_schemas(schemas)
         return sheets_dict
     
-    def _register_schema(self, file_id: str, df: pd.DataFrame, file_path: str, sheet_name: Optional[str] = None):
+    def _store_dataframe(self, file_id: str, df: pd.DataFrame):
+        """Store a DataFrame under file_id (replacing any earlier one) and track its columns."""
+        with self._columns_lock:
+            previous = self.dataframes.get(file_id)
+            if previous is not None:
+                self._forget_columns(previous)
+            self.dataframes[file_id] = df
+            self._column_counts.update(set(df.columns))
+            self._sorted_columns = None
+    
+    def _forget_columns(self, df: pd.DataFrame):
+        """Remove a DataFrame's columns from the column counts (caller holds _columns_lock)."""
+        self._column_counts.subtract(set(df.columns))
+        for col in set(df.columns):
+            if self._column_counts[col] <= 0:
+                del self._column_counts[col]
+        self._sorted_columns = None
+    
+    def _register_schema(self, file_id: str, df: pd.DataFrame, file_path: str, sheet_name: Optional[str] = None,
+                         loaded_at: Optional[str] = None, save: bool = True) -> Dict[str, Any]:
         """
         Register schema metadata for a DataFrame.
         
+        Per-column statistics ('columns' and 'sample_values') need full-column scans, so
+        they are computed on first access rather than at load time.
+        
         Args:
             file_id: File identifier
             df: DataFrame
             file_path: Original file path
             sheet_name: Optional sheet name
+            loaded_at: Optional load timestamp (defaults to now)
+            save: Whether to record the schema in the schema store (callers may batch that)
+            
+        Returns:
+            The registered schema
         """
-        schema = {
+        schema = _LazySchema({
             'file_id': file_id,
             'file_path': str(file_path),
             'sheet_name': sheet_name,
             'row_count': len(df),
             'column_count': len(df.columns),
-            'columns': {},
-            'sample_values': {},
-            'data_types': {},
-            'loaded_at': datetime.now().isoformat()
-        }
+            'column_names': list(df.columns),
+            'data_types': {col: logical_dtype_name(dtype) for col, dtype in df.dtypes.items()},
+            'file_signature': _file_signature(file_path),
+            'loaded_at': loaded_at or _now_iso()
+        }, lambda: self._column_stats(df))
+        
+        self.schemas[file_id] = schema
+        if save:
+            self._save_stored_schemas([schema])
+        logger.info(f"Registered schema for {file_id}: {len(df.columns)} columns")
+        return schema
+    
+    @staticmethod
+    def _column_stats(df: pd.DataFrame) -> Tuple[Dict[str, Any], Dict[str, List[Any]]]:
+        """
+        Compute per-column statistics and sample values for a DataFrame.
+        
+        Returns:
+            Tuple of ({column: stats}, {column: first 5 non-null values})
+        """
+        columns = {}
+        sample_values = {}
         
-        # Extract column information
-        for col in df.columns:
-            schema['columns'][col] = {
+        # Whole-frame reductions instead of several scans per column
+        row_count = len(df)
+        non_null_counts = df.count()
+        unique_counts = df.nunique()
+        # Leading rows as one object array plus a missing-value mask, shared by all columns
+        head = df.head(SCHEMA_SAMPLE_SCAN_ROWS)
+        head_values = head.to_numpy(dtype=object)
+        head_missing = head.isna().to_numpy()
+        for position, col in enumerate(df.columns):
+            non_null = int(non_null_counts.iloc[position])
+            columns[col] = {
                 'name': col,
-                'dtype': str(df[col].dtype),
-                'non_null_count': df[col].notna().sum(),
-                'null_count': df[col].isna().sum(),
-                'unique_count': df[col].nunique()
+                'dtype': logical_dtype_name(df.dtypes.iloc[position]),
+                'non_null_count': non_null,
+                'null_count': row_count - non_null,
+                'unique_count': int(unique_counts.iloc[position])
             }
             
-            # Sample values (first 5 non-null values)
-            sample = df[col].dropna().head(5).tolist()
-            schema['sample_values'][col] = sample
-            
-            # Data type
-            schema['data_types'][col] = str(df[col].dtype)
+            # Sample values (first 5 non-null values); usually found in the first few rows
+            sample = head_values[~head_missing[:, position], position][:5].tolist()
+            if len(sample) < 5 and non_null > len(sample):
+                sample = df.iloc[:, position].dropna().head(5).tolist()
+            sample_values[col] = sample
         
-        self.schemas[file_id] = schema
-        import logging
-        logger = logging.getLogger(__name__)
-        logger.info(f"Registered schema for {file_id}: {len(df.columns)} columns")
+        return columns, sample_values
     
     def get_dataframe(self, file_id: str) -> Optional[pd.DataFrame]:
         """Get a DataFrame by file_id."""
@@ -225,11 +765,11 @@ class DataLoader:
                 return list(self.dataframes[file_id].columns)
             return []
         else:
-            # Return unique column names from all files
-            all_columns = set()
-            for df in self.dataframes.values():
-                all_columns.update(df.columns)
-            return sorted(list(all_columns))
+            # Return unique column names from all files (maintained as files are loaded)
+            with self._columns_lock:
+                if self._sorted_columns is None:
+                    self._sorted_columns = sorted(self._column_counts)
+                return list(self._sorted_columns)
     
     def clear_data(self, file_id: Optional[str] = None):
         """
@@ -239,20 +779,32 @@ class DataLoader:
             file_id: Optional file ID. If None, clears all data.
         """
         if file_id:
-            if file_id in self.dataframes:
-                del self.dataframes[file_id]
-            if file_id in self.schemas:
-                del self.schemas[file_id]
-            import logging
-            logger = logging.getLogger(__name__)
+            with self._columns_lock:
+                df = self.dataframes.pop(file_id, None)
+                if df is not None:
+                    self._forget_columns(df)
+            schema = self.schemas.pop(file_id, None)
+            if schema is not None:
+                _remove_cached_frames(self._frame_cache_dir(), _frame_cache_path_key(Path(schema['file_path'])))
+            self._delete_stored_schemas("DELETE FROM schemas WHERE file_id = ?", (file_id,))
             logger.info(f"Cleared data for {file_id}")
         else:
-            self.dataframes.clear()
+            with self._columns_lock:
+                self.dataframes.clear()
+                self._column_counts.clear()
+                self._sorted_columns = None
             self.schemas.clear()
-            import logging
-            logger = logging.getLogger(__name__)
+            self._delete_stored_schemas("DELETE FROM schemas")
+            shutil.rmtree(self._frame_cache_dir(), ignore_errors=True)
             logger.info("Cleared all data")
     
+    def _delete_stored_schemas(self, sql: str, params: tuple = ()):
+        """Remove entries from the schema store (failures are logged, not raised)."""
+        try:
+            self._execute_store(sql, params)
+        except Exception as e:
+            logger.warning(f"Could not clear stored schemas: {e}")
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get statistics about loaded data."""
         total_rows = sum(len(df) for df in self.dataframes.values())
@@ -265,6 +817,6 @@ class DataLoader:
             'schemas': {fid: {
                 'row_count': schema['row_count'],
                 'column_count': schema['column_count'],
-                'columns': list(schema['columns'].keys())
+                'columns': list(schema['column_names'])
             } for fid, schema in self.schemas.items()}
         }
@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 import json
+import time
 from pathlib import Path
 from datetime import datetime
 from excel_to_rag import ExcelToRAG
@@ -14,6 +15,12 @@ import threading
 
 
 class ExcelRAGDesktopApp:
+    # File types listed from the files folder
+    FILE_EXTENSIONS = ('.xlsx', '.xls', '.xlsm', '.xlsb', '.csv')
+    # A folder scan is reused while the folder's mtime is unchanged, but only once that mtime is
+    # this old: a change within the timestamp granularity (2 s on FAT) may not move it
+    FOLDER_CACHE_MIN_AGE_NS = 2_000_000_000
+    
     def __init__(self, root):
         self.root = root
         self.root.title("📊 Excel/CSV to RAG System")
@@ -43,8 +50,10 @@ class ExcelRAGDesktopApp:
         self.download_path = os.path.join(os.path.expanduser("~"), "Downloads")
         self.files_folder_path = os.path.join(os.path.expanduser("~"), "Documents")  # Default folder for Excel files
         self.selected_file_path = None
-        self.selected_files = {}  # Dictionary to store selected files: {file_path: checkbox_var}
+        self.folder_files = []  # Files listed from the files folder (sorted paths)
+        self.selected_files = set()  # Checked files in the list (paths)
         self.loaded_files = set()  # Set of already processed files
+        self._folder_scan_cache = None  # (folder, mtime_ns, files) of the last folder scan
         
         # Load settings
         self.load_settings()
@@ -282,29 +291,29 @@ class ExcelRAGDesktopApp:
         files_list_frame.pack(fill=tk.BOTH, expand=False, pady=(0, 10))
         files_list_frame.config(height=200)  # Set a fixed height for file list
         
-        # Scrollable canvas for file list
-        canvas = tk.Canvas(files_list_frame, bg='white', highlightthickness=1, highlightbackground=self.colors['border'])
-        scrollbar = tk.Scrollbar(files_list_frame, orient="vertical", command=canvas.yview)
-        self.files_checkbox_frame = tk.Frame(canvas, bg='white')
-        
-        self.files_checkbox_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+        # File list: one Treeview draws only the visible rows (no widget per file); the
+        # first column holds a ☐/☑ checkbox, toggled by clicking the row
+        style = ttk.Style()
+        style.configure('Files.Treeview', background='white', fieldbackground='white',
+                        foreground=self.colors['text_primary'], font=('Segoe UI', 9), rowheight=24)
+        self.files_tree = ttk.Treeview(
+            files_list_frame,
+            columns=('status',),
+            show='tree',
+            selectmode='none',
+            height=8,
+            style='Files.Treeview'
         )
-        
-        canvas.create_window((0, 0), window=self.files_checkbox_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        
-        canvas.pack(side="left", fill="both", expand=True)
+        self.files_tree.column('#0', stretch=True)
+        self.files_tree.column('status', width=70, stretch=False, anchor=tk.E)
+        self.files_tree.tag_configure('loaded', foreground=self.colors['success'])
+        self.files_tree.tag_configure('placeholder', foreground=self.colors['text_secondary'], font=('Segoe UI', 10))
+        scrollbar = tk.Scrollbar(files_list_frame, orient="vertical", command=self.files_tree.yview)
+        self.files_tree.configure(yscrollcommand=scrollbar.set)
+        
+        self.files_tree.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
-        
-        # Enable mousewheel scrolling
-        def _on_mousewheel(event):
-            canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        canvas.bind("<MouseWheel>", _on_mousewheel)
-        
-        self.files_canvas = canvas
+        self.files_tree.bind('<Button-1>', self._on_file_row_click)
         
         # Select All / Deselect All buttons
         select_buttons_frame = tk.Frame(upload_frame, bg=self.colors['bg_card'])
@@ -546,126 +555,110 @@ class ExcelRAGDesktopApp:
         Args:
             preserve_selection: If True, preserve which files were checked before refresh
         """
-        if not os.path.exists(self.files_folder_path):
+        try:
+            folder_mtime_ns = os.stat(self.files_folder_path).st_mtime_ns
+        except OSError:
             messagebox.showerror("Error", f"Folder does not exist:\n{self.files_folder_path}")
             return
         
         # Save current selection state if preserving
-        saved_selection = set()
-        if preserve_selection:
-            for file_path, var in self.selected_files.items():
-                try:
-                    if var.get():
-                        saved_selection.add(file_path)
-                        print(f"DEBUG: Preserving selection for: {os.path.basename(file_path)}")
-                except:
-                    pass
-        
-        # Clear existing checkboxes
-        for widget in self.files_checkbox_frame.winfo_children():
-            widget.destroy()
-        self.selected_files.clear()
-        
-        # Find all Excel and CSV files
-        excel_extensions = ('.xlsx', '.xls', '.xlsm', '.xlsb', '.csv')
-        files_found = []
-        
-        try:
-            for file in os.listdir(self.files_folder_path):
-                file_path = os.path.join(self.files_folder_path, file)
-                if os.path.isfile(file_path) and file.lower().endswith(excel_extensions):
-                    files_found.append(file_path)
-        except Exception as e:
-            messagebox.showerror("Error", f"Error reading folder:\n{str(e)}")
-            return
+        saved_selection = set(self.selected_files) if preserve_selection else set()
+        for file_path in saved_selection:
+            print(f"DEBUG: Preserving selection for: {os.path.basename(file_path)}")
+        
+        # Clear existing rows
+        rows = self.files_tree.get_children()
+        if rows:
+            self.files_tree.delete(*rows)
+        self.folder_files = []
+        self.selected_files = set()
+        
+        # Find all Excel and CSV files (scandir entries usually know their type without a stat);
+        # an unchanged folder reuses the previous scan
+        cached = self._folder_scan_cache
+        if cached and cached[:2] == (self.files_folder_path, folder_mtime_ns):
+            files_found = list(cached[2])
+        else:
+            scan_started_ns = time.time_ns()
+            files_found = []
+            
+            try:
+                with os.scandir(self.files_folder_path) as entries:
+                    for entry in entries:
+                        if entry.name.lower().endswith(self.FILE_EXTENSIONS) and entry.is_file():
+                            files_found.append(entry.path)
+            except Exception as e:
+                messagebox.showerror("Error", f"Error reading folder:\n{str(e)}")
+                return
+            
+            if scan_started_ns - folder_mtime_ns >= self.FOLDER_CACHE_MIN_AGE_NS:
+                self._folder_scan_cache = (self.files_folder_path, folder_mtime_ns, tuple(files_found))
         
         if not files_found:
-            no_files_label = tk.Label(
-                self.files_checkbox_frame,
-                text="No Excel/CSV files found in this folder.",
-                bg='white',
-                fg=self.colors['text_secondary'],
-                font=('Segoe UI', 10),
-                padx=10,
-                pady=10
-            )
-            no_files_label.pack(anchor=tk.W, padx=10, pady=5)
+            self.files_tree.insert('', tk.END, text="No Excel/CSV files found in this folder.",
+                                   tags=('placeholder',))
             return
         
-        # Create checkboxes for each file
-        for file_path in sorted(files_found):
-            file_frame = tk.Frame(self.files_checkbox_frame, bg='white')
-            file_frame.pack(fill=tk.X, padx=5, pady=3)
-            
+        # One row per file (the file path is the row id)
+        self.folder_files = sorted(files_found)
+        for file_path in self.folder_files:
             # Restore selection state if preserving
-            should_be_checked = preserve_selection and file_path in saved_selection
-            var = tk.BooleanVar(value=should_be_checked)
-            filename = os.path.basename(file_path)
+            if file_path in saved_selection:
+                self.selected_files.add(file_path)
+                print(f"DEBUG: Restored selection for: {os.path.basename(file_path)}")
             
             # Check if file is already loaded
             is_loaded = file_path in self.loaded_files
-            checkbox_text = f"✓ {filename}" if is_loaded else filename
-            
-            checkbox = tk.Checkbutton(
-                file_frame,
-                text=checkbox_text,
-                variable=var,
-                bg='white',
-                fg=self.colors['text_primary'] if not is_loaded else self.colors['success'],
-                font=('Segoe UI', 9),
-                selectcolor='white',
-                activebackground='white',
-                activeforeground=self.colors['text_primary'],
-                anchor=tk.W,
-                command=lambda fp=file_path, v=var: self._on_file_checkbox_change(fp, v)
+            self.files_tree.insert(
+                '', tk.END,
+                iid=file_path,
+                text=self._file_row_text(file_path),
+                values=("(Loaded)" if is_loaded else "",),
+                tags=('file', 'loaded') if is_loaded else ('file',)
             )
-            checkbox.pack(side=tk.LEFT, fill=tk.X, expand=True)
-            
-            if is_loaded:
-                loaded_label = tk.Label(
-                    file_frame,
-                    text="(Loaded)",
-                    bg='white',
-                    fg=self.colors['success'],
-                    font=('Segoe UI', 8, 'italic')
-                )
-                loaded_label.pack(side=tk.RIGHT, padx=5)
-            
-            # Store the file path and variable
-            self.selected_files[file_path] = var
-            if should_be_checked:
-                print(f"DEBUG: Restored selection for: {filename}")
-        
-        # Update canvas scroll region
-        self.files_checkbox_frame.update_idletasks()
-        self.files_canvas.configure(scrollregion=self.files_canvas.bbox("all"))
         
         # Update folder label
         self.folder_label.config(text=f"Folder: {self.files_folder_path}\n({len(files_found)} files found)")
     
+    def _file_row_text(self, file_path):
+        """Text of a file row: checkbox, loaded mark and file name."""
+        checkbox = "☑" if file_path in self.selected_files else "☐"
+        loaded = "✓ " if file_path in self.loaded_files else ""
+        return f"{checkbox} {loaded}{os.path.basename(file_path)}"
+    
+    def _set_files_checked(self, file_paths, checked):
+        """Check or uncheck files in the list and redraw their rows."""
+        for file_path in file_paths:
+            if checked:
+                self.selected_files.add(file_path)
+            else:
+                self.selected_files.discard(file_path)
+            self.files_tree.item(file_path, text=self._file_row_text(file_path))
+    
     def select_all_files(self):
         """Select all files in the list."""
-        for var in self.selected_files.values():
-            var.set(True)
+        self._set_files_checked(self.folder_files, True)
     
     def deselect_all_files(self):
         """Deselect all files in the list."""
-        for var in self.selected_files.values():
-            var.set(False)
+        self._set_files_checked(self.folder_files, False)
     
-    def _on_file_checkbox_change(self, file_path, var):
-        """Debug callback when checkbox is clicked."""
-        filename = os.path.basename(file_path)
-        is_checked = var.get()
-        print(f"DEBUG: Checkbox changed for {filename}: {'checked' if is_checked else 'unchecked'}")
+    def _on_file_row_click(self, event):
+        """Toggle the checkbox of the clicked file row."""
+        file_path = self.files_tree.identify_row(event.y)
+        if not file_path or not self.files_tree.tag_has('file', file_path):
+            return
+        is_checked = file_path not in self.selected_files
+        self._set_files_checked([file_path], is_checked)
+        print(f"DEBUG: Checkbox changed for {os.path.basename(file_path)}: {'checked' if is_checked else 'unchecked'}")
     
     def process_selected_files(self):
         """Process all selected files."""
         print("="*50)
         print("DEBUG: process_selected_files called")
-        print(f"DEBUG: Total files in selected_files dict: {len(self.selected_files)}")
+        print(f"DEBUG: Total files in folder list: {len(self.folder_files)}")
         
-        if len(self.selected_files) == 0:
+        if len(self.folder_files) == 0:
             messagebox.showwarning("No Files Found", 
                 f"No files found in the selected folder.\n\n"
                 f"Folder: {self.files_folder_path}\n\n"
@@ -676,32 +669,22 @@ class ExcelRAGDesktopApp:
                 f"4. Click 'Refresh File List' button")
             return
         
-        # Get selected files
-        selected = []
-        for path, var in self.selected_files.items():
-            try:
-                checkbox_value = var.get()
-                filename = os.path.basename(path)
-                print(f"DEBUG: File '{filename}' checkbox value: {checkbox_value}")
-                if checkbox_value:
-                    selected.append(path)
-                    print(f"DEBUG: ✓ File selected: {filename}")
-            except Exception as e:
-                print(f"DEBUG: ✗ Error checking checkbox for {path}: {e}")
-                import traceback
-                traceback.print_exc()
+        # Get selected files (in list order)
+        selected = [path for path in self.folder_files if path in self.selected_files]
+        for path in selected:
+            print(f"DEBUG: ✓ File selected: {os.path.basename(path)}")
         
         print(f"DEBUG: Total selected files: {len(selected)}")
         print("="*50)
         
         if not selected:
-            file_list = "\n".join([f"  • {os.path.basename(path)}" for path in list(self.selected_files.keys())[:10]])
-            if len(self.selected_files) > 10:
-                file_list += f"\n  ... and {len(self.selected_files) - 10} more files"
+            file_list = "\n".join([f"  • {os.path.basename(path)}" for path in self.folder_files[:10]])
+            if len(self.folder_files) > 10:
+                file_list += f"\n  ... and {len(self.folder_files) - 10} more files"
             
             messagebox.showwarning("No Files Selected", 
                 f"Please select at least one file to process.\n\n"
-                f"Found {len(self.selected_files)} files in folder:\n"
+                f"Found {len(self.folder_files)} files in folder:\n"
                 f"{file_list}\n\n"
                 f"✓ Check the boxes next to the files you want to process\n"
                 f"✓ Then click 'Process Selected Files' again")
@@ -746,15 +729,17 @@ class ExcelRAGDesktopApp:
                             info_text += f"   Sheets: {len(sheets_dict)}\n"
                             print(f"DEBUG: Found {len(sheets_dict)} sheets")
                             
+                            # Chunk every sheet, then embed the whole workbook in one batch
+                            chunk_groups = []
                             for sheet_name, df in sheets_dict.items():
                                 print(f"DEBUG: Processing sheet '{sheet_name}' with {len(df)} rows")
                                 md_content = self.rag_system.convert_to_markdown(df, metadata={'sheet_name': sheet_name, 'file_path': file_path})
                                 chunks = self.rag_system.chunk_markdown(md_content)
                                 print(f"DEBUG: Created {len(chunks)} chunks for sheet '{sheet_name}'")
-                                sheet_file_id = f"{Path(file_path).stem}_{sheet_name}"
-                                self.rag_system.embed_and_store(chunks, file_id=sheet_file_id)
-                                print(f"DEBUG: Stored chunks for sheet '{sheet_name}'")
+                                chunk_groups.append((f"{Path(file_path).stem}_{sheet_name}", chunks))
                                 info_text += f"   - '{sheet_name}': {len(df)} rows, {len(df.columns)} columns\n"
+                            self.rag_system.embed_and_store_groups(chunk_groups)
+                            print(f"DEBUG: Stored chunks for {len(chunk_groups)} sheets")
                         else:
                             # Process single sheet/file
                             print(f"DEBUG: Reading single sheet/file: {filename}")
@@ -884,12 +869,13 @@ class ExcelRAGDesktopApp:
                     info_text = f"File: {os.path.basename(self.selected_file_path)}\n"
                     info_text += f"Total Sheets: {len(sheets_dict)}\n\n"
                     
+                    chunk_groups = []
                     for sheet_name, df in sheets_dict.items():
                         md_content = self.rag_system.convert_to_markdown(df, metadata={'sheet_name': sheet_name})
                         chunks = self.rag_system.chunk_markdown(md_content)
-                        sheet_file_id = f"{Path(self.selected_file_path).stem}_{sheet_name}"
-                        self.rag_system.embed_and_store(chunks, file_id=sheet_file_id)
+                        chunk_groups.append((f"{Path(self.selected_file_path).stem}_{sheet_name}", chunks))
                         info_text += f"Sheet '{sheet_name}': {len(df)} rows, {len(df.columns)} columns\n"
+                    self.rag_system.embed_and_store_groups(chunk_groups)
                     
                     self.file_info_text.delete(1.0, tk.END)
                     self.file_info_text.insert(1.0, info_text)
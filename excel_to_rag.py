@@ -9,12 +9,13 @@ import os
 import json
 import ast
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import chromadb
 from chromadb.config import Settings
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import re
+from rag_pipeline import INGEST_BATCH_SIZE
 
 
 class ExcelToRAG:
@@ -455,7 +456,21 @@ class ExcelToRAG:
             chunks: List of chunk dictionaries
             file_id: Optional file identifier
         """
-        print(f"Embedding and storing {len(chunks)} chunks...")
+        self.embed_and_store_groups([(file_id, chunks)])
+    
+    def embed_and_store_groups(self, chunk_groups: List[Tuple[Optional[str], List[Dict[str, Any]]]]):
+        """
+        Embed chunks of several files (e.g. every sheet of a workbook) in one encode call
+        and store them in ChromaDB.
+        
+        Args:
+            chunk_groups: List of (file_id, chunks) pairs; chunk ids are numbered per
+                file_id exactly as embed_and_store numbers them
+        """
+        total_chunks = sum(len(chunks) for _, chunks in chunk_groups)
+        print(f"Embedding and storing {total_chunks} chunks...")
+        if total_chunks == 0:
+            return
         
         # Prepare data for ChromaDB
         ids = []
@@ -463,36 +478,48 @@ class ExcelToRAG:
         metadatas = []
         embeddings = []
         
-        for i, chunk in enumerate(chunks):
-            chunk_id = f"{file_id}_chunk_{i}" if file_id else f"chunk_{i}"
-            ids.append(chunk_id)
-            documents.append(chunk["content"])
-            
-            # Add file_id to metadata if provided
-            metadata = chunk.get("metadata", {}).copy()
-            if file_id:
-                metadata["file_id"] = file_id
-            metadata["chunk_id"] = chunk_id
-            metadatas.append(metadata)
-        
-        # Generate embeddings
+        for file_id, chunks in chunk_groups:
+            for i, chunk in enumerate(chunks):
+                chunk_id = f"{file_id}_chunk_{i}" if file_id else f"chunk_{i}"
+                ids.append(chunk_id)
+                documents.append(chunk["content"])
+                
+                # Add file_id to metadata if provided
+                metadata = chunk.get("metadata", {}).copy()
+                if file_id:
+                    metadata["file_id"] = file_id
+                metadata["chunk_id"] = chunk_id
+                metadatas.append(metadata)
+        
+        # Generate embeddings (one pass over all groups keeps the model's batches full)
         print("Generating embeddings...")
         embeddings = self.embedder.encode(
             documents,
+            batch_size=64,
             show_progress_bar=True,
             convert_to_numpy=True
         ).tolist()
         
-        # Store in ChromaDB
+        # Store in ChromaDB, in slices no larger than it accepts per add
         print("Storing in ChromaDB...")
-        self.collection.add(
-            ids=ids,
-            documents=documents,
-            metadatas=metadatas,
-            embeddings=embeddings
-        )
+        batch_size = self._max_add_batch_size()
+        for start in range(0, total_chunks, batch_size):
+            end = start + batch_size
+            self.collection.add(
+                ids=ids[start:end],
+                documents=documents[start:end],
+                metadatas=metadatas[start:end],
+                embeddings=embeddings[start:end]
+            )
         
-        print(f"Successfully stored {len(chunks)} chunks in ChromaDB")
+        print(f"Successfully stored {total_chunks} chunks in ChromaDB")
+    
+    def _max_add_batch_size(self) -> int:
+        """Chunks per collection.add: INGEST_BATCH_SIZE, capped by the client's max batch size."""
+        get_max_batch_size = getattr(self.client, 'get_max_batch_size', None)
+        if get_max_batch_size is None:
+            return INGEST_BATCH_SIZE
+        return max(1, min(INGEST_BATCH_SIZE, get_max_batch_size()))
     
     def process_file(self, file_path: str, 
                     metadata: Optional[Dict] = None,
@@ -523,6 +550,7 @@ class ExcelToRAG:
             sheets_dict = self.read_all_sheets(file_path)
             
             md_paths = []
+            chunk_groups = []
             for sheet_name, df in sheets_dict.items():
                 print(f"\n{'='*60}")
                 print(f"Processing sheet: {sheet_name}")
@@ -554,10 +582,10 @@ class ExcelToRAG:
                 chunks = self.chunk_markdown(md_content)
                 print(f"Created {len(chunks)} chunks")
                 
-                # Embed and store with sheet-specific file_id
-                sheet_file_id = f"{file_id}_{sheet_name}"
-                self.embed_and_store(chunks, file_id=sheet_file_id)
+                # Embedded below with the other sheets, under a sheet-specific file_id
+                chunk_groups.append((f"{file_id}_{sheet_name}", chunks))
             
+            self.embed_and_store_groups(chunk_groups)
             return md_paths if save_md else None
         
         else:
@@ -60,6 +60,50 @@ class IntentClassifier:
     MEDIUM_CONFIDENCE = 0.5
     AMBIGUITY_THRESHOLD = 0.15  # If top 2 intents are within this, consider ambiguous
     
+    # Example queries for each intent type, used for MiniLM similarity scoring
+    INTENT_EXAMPLES = {
+        INTENT_COLUMN_NAMES: [
+            "What are all the column names in this file?",
+            "List all columns",
+            "Show me column names"
+        ],
+        INTENT_ROW_COUNT: [
+            "How many rows are there?",
+            "What is the total number of rows?",
+            "Count of records"
+        ],
+        INTENT_AGGREGATION: [
+            "What is the total cost?",
+            "Sum of all values",
+            "What is the average?"
+        ],
+        INTENT_LIST: [
+            "What are all the source locations?",
+            "List unique values",
+            "Show me all different products"
+        ],
+        INTENT_RANKING: [
+            "Which has the highest cost?",
+            "Top consignment",
+            "Most frequent"
+        ],
+        INTENT_PREVIEW: [
+            "Show me the first 5 rows",
+            "Preview data",
+            "Sample rows"
+        ],
+        INTENT_TIME_BASED: [
+            "What is the date range?",
+            "Dispatch dates",
+            "Time period"
+        ],
+        INTENT_FILTER: [
+            "Show consignments going to Mumbai",
+            "Filter by destination",
+            "Where condition"
+        ]
+    }
+    
     def __init__(self):
         """Initialize intent classifier."""
         # FAQ to intent mapping (static - never changes)
@@ -67,6 +111,7 @@ class IntentClassifier:
         
         # Initialize MiniLM for similarity scoring (optional)
         self.minilm = None
+        self._example_embeddings = None  # Normalized INTENT_EXAMPLES embeddings, encoded on first use
         if MINILM_AVAILABLE:
             try:
                 self.minilm = SentenceTransformer('all-MiniLM-L6-v2')
@@ -239,63 +284,25 @@ class IntentClassifier:
             return {}
         
         try:
-            # Get example queries for each intent type
-            intent_examples = {
-                self.INTENT_COLUMN_NAMES: [
-                    "What are all the column names in this file?",
-                    "List all columns",
-                    "Show me column names"
-                ],
-                self.INTENT_ROW_COUNT: [
-                    "How many rows are there?",
-                    "What is the total number of rows?",
-                    "Count of records"
-                ],
-                self.INTENT_AGGREGATION: [
-                    "What is the total cost?",
-                    "Sum of all values",
-                    "What is the average?"
-                ],
-                self.INTENT_LIST: [
-                    "What are all the source locations?",
-                    "List unique values",
-                    "Show me all different products"
-                ],
-                self.INTENT_RANKING: [
-                    "Which has the highest cost?",
-                    "Top consignment",
-                    "Most frequent"
-                ],
-                self.INTENT_PREVIEW: [
-                    "Show me the first 5 rows",
-                    "Preview data",
-                    "Sample rows"
-                ],
-                self.INTENT_TIME_BASED: [
-                    "What is the date range?",
-                    "Dispatch dates",
-                    "Time period"
-                ],
-                self.INTENT_FILTER: [
-                    "Show consignments going to Mumbai",
-                    "Filter by destination",
-                    "Where condition"
-                ]
-            }
+            # Encode the (static) intent examples once, normalized so cosine similarity is a dot product
+            if self._example_embeddings is None:
+                all_examples = [example for examples in self.INTENT_EXAMPLES.values() for example in examples]
+                self._example_embeddings = self.minilm.encode(
+                    all_examples, batch_size=64, convert_to_numpy=True, normalize_embeddings=True
+                )
             
-            # Compute similarity scores
-            query_embedding = self.minilm.encode([query])[0]
+            # Compute similarity scores against all examples at once
+            query_embedding = self.minilm.encode(
+                [query], convert_to_numpy=True, normalize_embeddings=True
+            )[0]
+            similarities = self._example_embeddings @ query_embedding
             intent_scores = {}
             
-            for intent, examples in intent_examples.items():
-                # Encode examples
-                example_embeddings = self.minilm.encode(examples)
-                
+            start = 0
+            for intent, examples in self.INTENT_EXAMPLES.items():
                 # Compute max similarity (best match)
-                similarities = np.dot(example_embeddings, query_embedding) / (
-                    np.linalg.norm(example_embeddings, axis=1) * np.linalg.norm(query_embedding)
-                )
-                max_similarity = float(np.max(similarities))
+                max_similarity = float(np.max(similarities[start:start + len(examples)]))
+                start += len(examples)
                 
                 # Normalize to 0-1 range (cosine similarity is -1 to 1, we want 0 to 1)
                 intent_scores[intent] = (max_similarity + 1) / 2
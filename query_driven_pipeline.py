@@ -157,10 +157,13 @@ class QueryDrivenPipeline:
             
             if file_ext in ['.xlsx', '.xls', '.xlsm', '.xlsb'] and process_all_sheets:
                 sheets = self.data_loader.load_all_sheets(file_path, file_id)
+                base_file_id = file_id or file_path_obj.stem
                 return {
                     'success': True,
                     'message': f'Loaded {len(sheets)} sheet(s)',
-                    'file_ids': list(sheets.keys())
+                    'file_ids': list(sheets.keys()),
+                    # Ids the sheets are stored under in the data loader
+                    'loaded_file_ids': [f"{base_file_id}_{sheet_name}" for sheet_name in sheets]
                 }
             else:
                 fid, df = self.data_loader.load_file(file_path, file_id)
@@ -168,6 +171,7 @@ class QueryDrivenPipeline:
                     'success': True,
                     'message': f'Loaded file: {fid}',
                     'file_id': fid,
+                    'loaded_file_ids': [fid],
                     'rows': len(df),
                     'columns': len(df.columns)
                 }
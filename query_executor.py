@@ -14,6 +14,7 @@ Design Philosophy:
 from typing import Dict, List, Any, Optional, Tuple
 import pandas as pd
 import numpy as np
+from data_loader import logical_dtype_name
 
 
 class QueryExecutor:
@@ -413,7 +414,7 @@ class QueryExecutor:
                 'success': True,
                 'result_type': 'data_types',
                 'data': {
-                    'all_types': {k: str(v) for k, v in dtypes.items()},
+                    'all_types': {k: logical_dtype_name(v) for k, v in dtypes.items()},
                     'numerical': numerical,
                     'text': text,
                     'datetime': datetime_cols
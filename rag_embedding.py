@@ -50,6 +50,7 @@ class RAGEmbedding:
         
         embeddings = self.embedder.encode(
             documents,
+            batch_size=64,
             show_progress_bar=show_progress,
             convert_to_numpy=True
         )
@@ -21,6 +21,10 @@ from rag_embedding import RAGEmbedding
 from rag_retrieval import RAGRetrieval
 from rag_generation import RAGGeneration
 
+# Chunks embedded and inserted per batch during ingestion; keeps each encode call and
+# ChromaDB insert bounded (ChromaDB rejects adds above its max batch size)
+INGEST_BATCH_SIZE = 256
+
 
 class RAGPipeline:
     """
@@ -115,12 +119,14 @@ class RAGPipeline:
             chunks: List of chunk dictionaries with content and metadata
             file_id: Optional file identifier
         """
-        # Generate embeddings for chunks
-        documents = [chunk["content"] for chunk in chunks]
-        embeddings = self.embedding.embed_documents(documents, show_progress=True)
-        
-        # Store in vector database
-        self.retrieval.store_chunks(chunks, embeddings, file_id)
+        # Embed and store in batches: one encode call and one insert per batch
+        for start in range(0, len(chunks), INGEST_BATCH_SIZE):
+            batch = chunks[start:start + INGEST_BATCH_SIZE]
+            documents = [chunk["content"] for chunk in batch]
+            embeddings = self.embedding.embed_documents(documents, show_progress=False)
+            
+            # Store in vector database
+            self.retrieval.store_chunks(batch, embeddings, file_id, start_index=start)
     
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -42,7 +42,8 @@ class RAGRetrieval:
     
     def store_chunks(self, chunks: List[Dict[str, Any]], 
                     embeddings: List[List[float]],
-                    file_id: Optional[str] = None):
+                    file_id: Optional[str] = None,
+                    start_index: int = 0):
         """
         Store document chunks with embeddings in vector database.
         
@@ -50,6 +51,7 @@ class RAGRetrieval:
             chunks: List of chunk dictionaries with content and metadata
             embeddings: List of embedding vectors (one per chunk)
             file_id: Optional file identifier for metadata
+            start_index: Index of the first chunk within the document (used for chunk IDs)
         """
         if len(chunks) != len(embeddings):
             raise ValueError("Number of chunks must match number of embeddings")
@@ -59,7 +61,7 @@ class RAGRetrieval:
         documents = []
         metadatas = []
         
-        for i, chunk in enumerate(chunks):
+        for i, chunk in enumerate(chunks, start_index):
             chunk_id = f"{file_id}_chunk_{i}" if file_id else f"chunk_{i}"
             ids.append(chunk_id)
             documents.append(chunk["content"])
@@ -184,8 +186,8 @@ class RAGRetrieval:
         Returns:
             Dictionary with collection statistics
         """
-        all_data = self.collection.get()
+        # count() reads the stored total instead of fetching every chunk
         return {
-            "total_chunks": len(all_data['ids']) if all_data['ids'] else 0,
+            "total_chunks": self.collection.count(),
             "collection_name": self.collection_name
         }
@@ -3,6 +3,9 @@
  * Embeddable chatbot for any webpage
  */
 
+// Files larger than this are uploaded in resumable chunks of this size (8 MB)
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024;
+
 class ChatbotWidget {
     constructor(config = {}) {
         // Auto-detect API URL from current page if not provided
@@ -3072,12 +3075,6 @@ class ChatbotWidget {
         
         const processAfterUpload = document.getElementById('process-after-upload')?.checked ?? true;
         
-        const formData = new FormData();
-        for (let i = 0; i < fileInput.files.length; i++) {
-            formData.append('file', fileInput.files[i]);
-        }
-        formData.append('process', processAfterUpload ? 'true' : 'false');
-        
         try {
             if (processAfterUpload) {
                 this.showNotification('Uploading and processing files... This may take a while.');
@@ -3085,12 +3082,27 @@ class ChatbotWidget {
                 this.showNotification('Uploading files...');
             }
             
-            const response = await fetch(`${this.apiUrl}/upload`, {
-                method: 'POST',
-                body: formData
-            });
-            
-            const data = await response.json();
+            // Send each file as the raw request body so the server can stream it to disk;
+            // large files go in resumable chunks
+            let data = {};
+            for (const file of fileInput.files) {
+                if (file.size > UPLOAD_CHUNK_SIZE) {
+                    data = await this.uploadFileInChunks(file, processAfterUpload);
+                } else {
+                    const response = await fetch(`${this.apiUrl}/upload_stream?process=${processAfterUpload ? 'true' : 'false'}`, {
+                        method: 'POST',
+                        headers: {
+                            'Content-Type': 'application/octet-stream',
+                            'X-Filename': encodeURIComponent(file.name)
+                        },
+                        body: file
+                    });
+                    data = await response.json();
+                }
+                if (data.error) {
+                    break;
+                }
+            }
             
             if (data.error) {
                 alert(`Error: ${data.error}`);
@@ -3112,6 +3124,37 @@ class ChatbotWidget {
         }
     }
     
+    async uploadFileInChunks(file, processAfterUpload) {
+        // Resumable upload: ask the server which bytes it already has, then send the rest
+        const uploadId = `${file.name}-${file.size}-${file.lastModified}`.replace(/[^A-Za-z0-9_-]/g, '_').slice(-64);
+        const statusResponse = await fetch(`${this.apiUrl}/upload_chunk?upload_id=${encodeURIComponent(uploadId)}`);
+        const status = await statusResponse.json();
+        const received = new Set((status.total === file.size ? status.ranges || [] : []).map(([start]) => start));
+        
+        let data = {};
+        for (let start = 0; start < file.size; start += UPLOAD_CHUNK_SIZE) {
+            if (received.has(start)) {
+                continue;
+            }
+            const end = Math.min(start + UPLOAD_CHUNK_SIZE, file.size) - 1;
+            const response = await fetch(`${this.apiUrl}/upload_chunk?process=${processAfterUpload ? 'true' : 'false'}`, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/octet-stream',
+                    'X-Upload-Id': uploadId,
+                    'X-Filename': encodeURIComponent(file.name),
+                    'Content-Range': `bytes ${start}-${end}/${file.size}`
+                },
+                body: file.slice(start, end + 1)
+            });
+            data = await response.json();
+            if (data.error) {
+                break;
+            }
+        }
+        return data;
+    }
+    
     async processUploadedFiles() {
         try {
             this.showNotification('Checking for uploaded files...');
@@ -0,0 +1,94 @@
+"""
+Test that /api/files/process skips only unchanged loaded files and loads files sharing a file id in order.
+Run with: python test_file_dedup.py
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+import app
+from query_driven_pipeline import QueryDrivenPipeline
+
+
+class FileDedupTest(unittest.TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmpdir = tempfile.mkdtemp()
+        os.chdir(self.tmpdir)
+        self.previous_pipeline = app.query_pipeline
+        app.query_pipeline = QueryDrivenPipeline(db_path=os.path.join(self.tmpdir, 'data_cache.db'))
+        with app._loaded_file_hashes_lock:
+            app._loaded_file_hashes.clear()
+            app._file_id_hashes.clear()
+        app.loaded_files.clear()
+
+    def tearDown(self):
+        app.query_pipeline = self.previous_pipeline
+        os.chdir(self.cwd)
+        shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def test_unchanged_file_is_skipped(self):
+        pd.DataFrame({'Item': ['A', 'B'], 'Qty': [1, 2]}).to_csv('stock.csv', index=False)
+
+        first = app._process_file('stock.csv', True)
+        second = app._process_file('stock.csv', True)
+
+        self.assertEqual(first['status'], 'success')
+        self.assertFalse(first.get('skipped', False))
+        self.assertTrue(second.get('skipped'))
+
+    def test_skipped_copy_from_another_folder_bumps_data_version(self):
+        os.mkdir('copy')
+        pd.DataFrame({'Item': ['A', 'B'], 'Qty': [1, 2]}).to_csv('stock.csv', index=False)
+        shutil.copy('stock.csv', os.path.join('copy', 'stock.csv'))
+        client = app.app.test_client()
+
+        client.post('/api/files/process', json={'file_paths': ['stock.csv']})
+        version = app._data_version
+        response = client.post('/api/files/process', json={'file_paths': [os.path.join('copy', 'stock.csv')]})
+
+        self.assertTrue(response.get_json()['results'][0].get('skipped'))
+        self.assertEqual(len(app.loaded_files), 2)
+        self.assertGreater(app._data_version, version)
+
+    def test_sheet_overwritten_by_other_file_is_reloaded(self):
+        workbook = pd.DataFrame({'Item': ['A', 'B'], 'Qty': [1, 2]})
+        workbook.to_excel('data.xlsx', sheet_name='Sheet1', index=False)
+        # Same file id as the workbook's sheet: data_Sheet1
+        pd.DataFrame({'Other': [9]}).to_csv('data_Sheet1.csv', index=False)
+
+        app._process_file('data.xlsx', True)
+        app._process_file('data_Sheet1.csv', True)
+        loader = app.query_pipeline.data_loader
+        self.assertEqual(list(loader.get_dataframe('data_Sheet1').columns), ['Other'])
+
+        result = app._process_file('data.xlsx', True)
+
+        self.assertEqual(result['status'], 'success')
+        self.assertFalse(result.get('skipped', False))
+        self.assertEqual(list(loader.get_dataframe('data_Sheet1').columns), ['Item', 'Qty'])
+
+    def test_files_sharing_a_file_id_load_in_request_order(self):
+        self.assertEqual(
+            app._file_id_groups(['a/data.xlsx', 'b/other.csv', 'data_Sheet1.csv', 'data_Sheet1_x.csv', 'data.csv']),
+            [[0, 2, 3, 4], [1]]
+        )
+
+        pd.DataFrame({'Item': ['A'], 'Qty': [1]}).to_excel('data.xlsx', sheet_name='Sheet1', index=False)
+        pd.DataFrame({'Other': [9]}).to_csv('data_Sheet1.csv', index=False)
+        client = app.app.test_client()
+        loader = app.query_pipeline.data_loader
+
+        client.post('/api/files/process', json={'file_paths': ['data_Sheet1.csv', 'data.xlsx']})
+        self.assertEqual(list(loader.get_dataframe('data_Sheet1').columns), ['Item', 'Qty'])
+
+        client.post('/api/files/process', json={'file_paths': ['data.xlsx', 'data_Sheet1.csv']})
+        self.assertEqual(list(loader.get_dataframe('data_Sheet1').columns), ['Other'])
+
+
+if __name__ == '__main__':
+    unittest.main()